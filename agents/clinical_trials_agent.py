@@ -50,70 +50,291 @@
 
 # agents/clinical_trials_agent.py
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import os
+import tempfile
+from datetime import datetime, timezone
+
+from utils.rate_limit import TokenBucket
+from utils.datastore import store
+
 
 class ClinicalTrialsAgent:
 
     API_URL = "https://clinicaltrials.gov/api/v2/studies"
 
-    def get_trials(self, drug):
-        print("ClinicalTrials Agent: Fetching detailed trial data...")
+    PAGE_SIZE = 100
+    MAX_PAGES = 10                  # cap on nextPageToken hops per run
+
+    # ClinicalTrials.gov asks for ~50 requests/minute per client
+    RATE_LIMITER = TokenBucket(rate=50 / 60, capacity=10)
+
+    # Only the pieces _clean() reads (v2 field projection)
+    FIELDS = [
+        "protocolSection.identificationModule.nctId",
+        "protocolSection.identificationModule.officialTitle",
+        "protocolSection.statusModule.overallStatus",
+        "protocolSection.statusModule.startDateStruct",
+        "protocolSection.statusModule.completionDateStruct",
+        "protocolSection.statusModule.lastUpdatePostDateStruct",
+        "protocolSection.conditionsModule.conditions",
+        "protocolSection.designModule.phases",
+        "protocolSection.designModule.studyType",
+        "protocolSection.designModule.enrollmentInfo",
+        "protocolSection.descriptionModule.briefSummary",
+        "protocolSection.descriptionModule.detailedDescription",
+        "protocolSection.armsInterventionsModule.interventions",
+        "protocolSection.sponsorCollaboratorsModule.leadSponsor",
+        "protocolSection.contactsLocationsModule.locations",
+        "protocolSection.eligibilityModule.eligibilityCriteria",
+    ]
+
+    def __init__(self):
+        self.session = self._create_session()
+
+    # --------------------------------------------------
+    # SAFE REQUEST SESSION
+    # --------------------------------------------------
+    def _create_session(self):
+        session = requests.Session()
+
+        retries = Retry(
+            total=5,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+
+        adapter = HTTPAdapter(max_retries=retries, pool_maxsize=10)
+        session.mount("https://", adapter)
+
+        return session
+
+    # --------------------------------------------------
+    # FLATTEN ONE STUDY
+    # --------------------------------------------------
+    def _clean(self, s):
+        p = s.get("protocolSection", {})
+
+        return {
+            "nct_id": p.get("identificationModule", {}).get("nctId"),
+            "title": p.get("identificationModule", {}).get("officialTitle"),
+            "status": p.get("statusModule", {}).get("overallStatus"),
+
+            # Conditions / phase
+            "conditions": p.get("conditionsModule", {}).get("conditions", []),
+            "phases": p.get("designModule", {}).get("phases", []),
+
+            # NEW FIELDS (needed for modal)
+            "brief_summary": p.get("descriptionModule", {}).get("briefSummary"),
+            "detailed_description": p.get("descriptionModule", {}).get("detailedDescription"),
+
+            "interventions": p.get("armsInterventionsModule", {}).get("interventions", []),
+
+            "sponsors": p.get("sponsorCollaboratorsModule", {}).get("leadSponsor", {}).get("name"),
+
+            "locations": p.get("contactsLocationsModule", {}).get("locations", []),
+
+            "eligibility": p.get("eligibilityModule", {}).get("eligibilityCriteria"),
+
+            "study_type": p.get("designModule", {}).get("studyType"),
+            "start_date": p.get("statusModule", {}).get("startDateStruct", {}).get("date"),
+            "completion_date": p.get("statusModule", {}).get("completionDateStruct", {}).get("date"),
+            "last_update_posted": p.get("statusModule", {}).get("lastUpdatePostDateStruct", {}).get("date"),
+
+            "enrollment": p.get("designModule", {}).get("enrollmentInfo", {}).get("count")
+        }
+
+    # --------------------------------------------------
+    # PAGINATED FETCH (GENERATOR, ONE PAGE AT A TIME)
+    # --------------------------------------------------
+    def iter_pages(self, drug, max_pages=None, extra_params=None, stats=None):
+        """
+        Yield cleaned studies one page at a time, at most max_pages pages.
+        stats (optional dict) gets "truncated": True when the cap stopped
+        the walk while the API still had a next page.
+        """
+        max_pages = max_pages or self.MAX_PAGES
+        if stats is not None:
+            stats["truncated"] = False
 
         params = {
             "query.intr": drug,
             "countTotal": "true",
-            "pageSize": 50
+            "pageSize": self.PAGE_SIZE,
+            "fields": ",".join(self.FIELDS),
         }
+        params.update(extra_params or {})
 
-        try:
-            response = requests.get(self.API_URL, params=params, timeout=20)
+        for page in range(max_pages):
+            self.RATE_LIMITER.acquire()
+            response = self.session.get(self.API_URL, params=params, timeout=20)
             response.raise_for_status()
 
             data = response.json()
-            studies = data.get("studies", [])
-
-            cleaned = []
-
-            for s in studies:
-                p = s.get("protocolSection", {})
-
-                cleaned.append({
-                    "nct_id": p.get("identificationModule", {}).get("nctId"),
-                    "title": p.get("identificationModule", {}).get("officialTitle"),
-                    "status": p.get("statusModule", {}).get("overallStatus"),
-
-                    # Conditions / phase
-                    "conditions": p.get("conditionsModule", {}).get("conditions", []),
-                    "phases": p.get("designModule", {}).get("phases", []),
-
-                    # NEW FIELDS (needed for modal)
-                    "brief_summary": p.get("descriptionModule", {}).get("briefSummary"),
-                    "detailed_description": p.get("descriptionModule", {}).get("detailedDescription"),
-
-                    "interventions": p.get("armsInterventionsModule", {}).get("interventions", []),
-
-                    "sponsors": p.get("sponsorsModule", {}).get("leadSponsor", {}).get("name"),
-
-                    "locations": p.get("contactsLocationsModule", {}).get("locations", []),
-
-                    "eligibility": p.get("eligibilityModule", {}).get("eligibilityCriteria"),
+            if page == 0 and "totalCount" in data:
+                print(f"ClinicalTrials: {data['totalCount']} matching studies.")
+
+            yield [self._clean(s) for s in data.get("studies", [])]
+
+            token = data.get("nextPageToken")
+            if not token:
+                return
+            params["pageToken"] = token
+
+        if stats is not None:
+            stats["truncated"] = True
+
+    # --------------------------------------------------
+    # WATERMARK (newest last_update_posted per drug)
+    # --------------------------------------------------
+    @staticmethod
+    def _update_key(date):
+        # v2 dates are "YYYY-MM-DD" or "YYYY-MM"
+        if not date:
+            return ""
+        return date if len(date) > 7 else f"{date}-01"
+
+    def _load_state(self, drug):
+        """Stored trials + watermark, or (None, None) if there is no usable state."""
+        watermark = (store.get_meta(drug, "trials_watermark") or {}).get("watermark")
+        if not watermark:
+            return None, None
+
+        trials = store.get(drug, "clinical_trials")
+        return (trials, watermark) if trials is not None else (None, None)
+
+    def _save_watermark(self, drug, trials, mode):
+        # "partial": the page cap cut a full walk short. No watermark, so the
+        # next run fetches in full instead of merging onto a truncated set
+        watermark = "" if mode == "partial" else max(
+            (self._update_key(t.get("last_update_posted")) for t in trials), default=""
+        )
+        store.set_meta(drug, "trials_watermark", {
+            "watermark": watermark or None,
+            "refreshed_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "mode": mode,
+            "trial_count": len(trials)
+        })
+
+    # --------------------------------------------------
+    # MAIN ENTRY
+    # --------------------------------------------------
+    def get_trials(self, drug, max_pages=None, incremental=True):
+        """
+        incremental=True: if a stored set and watermark exist, only ask for
+        studies updated since the watermark and merge them by nct_id.
+        Otherwise (or with incremental=False) refetch everything.
+        """
+        print("ClinicalTrials Agent: Fetching detailed trial data...")
 
-                    "study_type": p.get("designModule", {}).get("studyType"),
-                    "start_date": p.get("statusModule", {}).get("startDateStruct", {}).get("date"),
-                    "completion_date": p.get("statusModule", {}).get("completionDateStruct", {}).get("date"),
-                    "last_update_posted": p.get("statusModule", {}).get("lastUpdatePostDateStruct", {}).get("date"),
+        os.makedirs(f"data/{drug}", exist_ok=True)
 
-                    "enrollment": p.get("designModule", {}).get("enrollmentInfo", {}).get("count")
-                })
+        if incremental:
+            stored, watermark = self._load_state(drug)
+            if stored is not None:
+                return self._incremental_refresh(drug, stored, watermark, max_pages)
 
-            os.makedirs(f"data/{drug}", exist_ok=True)
-            with open(f"data/{drug}/clinical_trials.json", "w", encoding="utf-8") as f:
-                json.dump(cleaned, f, indent=2)
+        trials, complete, truncated = self._full_refresh(drug, max_pages)
+        if trials and complete:
+            if truncated:
+                print("ClinicalTrials: page cap reached, next run fetches in full again")
+            self._save_watermark(drug, trials, "partial" if truncated else "full")
+        return trials
 
-            print(f"ClinicalTrials: Retrieved {len(cleaned)} detailed trials.")
-            return cleaned
+    # --------------------------------------------------
+    # INCREMENTAL REFRESH (ONLY STUDIES UPDATED SINCE WATERMARK)
+    # --------------------------------------------------
+    def _incremental_refresh(self, drug, stored, watermark, max_pages):
+        since = {"filter.advanced": f"AREA[LastUpdatePostDate]RANGE[{watermark},MAX]"}
+        stats = {}
 
+        try:
+            changed = [
+                rec
+                for page in self.iter_pages(drug, max_pages=max_pages, extra_params=since, stats=stats)
+                for rec in page
+            ]
         except Exception as e:
-            print("ClinicalTrials ERROR:", e)
-            return []
+            print("ClinicalTrials ERROR (incremental, serving stored set):", e)
+            return stored
+
+        by_id = {t.get("nct_id"): i for i, t in enumerate(stored)}
+        merged = list(stored)
+        new, updated = [], 0
+
+        for rec in changed:
+            i = by_id.get(rec.get("nct_id"))
+            if i is None:
+                new.append(rec)
+            elif merged[i] != rec:
+                merged[i] = rec
+                updated += 1
+
+        merged = new + merged
+        unchanged = len(merged) - len(new) - updated
+
+        print(f"ClinicalTrials: incremental since {watermark} → "
+              f"{len(new)} new, {updated} updated, {unchanged} unchanged.")
+
+        if new or updated:
+            store.put(drug, "clinical_trials", merged)
+        else:
+            store.touch(drug, "clinical_trials")
+
+        # Past the page cap some updated studies were not fetched: moving
+        # the watermark would skip them for good, so the next run asks again
+        if stats["truncated"]:
+            print(f"ClinicalTrials: page cap reached, keeping watermark {watermark}")
+        else:
+            self._save_watermark(drug, merged, "incremental")
+
+        return merged
+
+    # --------------------------------------------------
+    # FULL REFRESH (STREAMS TO clinical_trials.json)
+    # --------------------------------------------------
+    def _full_refresh(self, drug, max_pages):
+        path = f"data/{drug}/clinical_trials.json"
+
+        cleaned = []
+        error = None
+        stats = {}
+
+        # Each page is written as soon as it arrives, to a temp file of its
+        # own (as utils.datastore.write_json_atomic); the file only
+        # replaces the previous one once the run has finished.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write("[")
+                try:
+                    for page in self.iter_pages(drug, max_pages=max_pages, stats=stats):
+                        for rec in page:
+                            f.write(",\n" if cleaned else "\n")
+                            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+                            cleaned.append(rec)
+                except Exception as e:
+                    error = e
+                    print("ClinicalTrials ERROR:", e)
+                f.write("\n]")
+
+            # Keep the previous set if this run got nothing at all
+            keep = bool(cleaned) or error is None
+            if keep:
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if keep:
+            store.put(drug, "clinical_trials", cleaned, export=False)
+
+        print(f"ClinicalTrials: Retrieved {len(cleaned)} detailed trials.")
+        return cleaned, error is None, stats.get("truncated", False)
@@ -1,24 +1,25 @@
 # agents/exim_agent.py
-import os, json, random
-from datetime import datetime
+import random
 
 from files.paracetamol_real_exim import PARACETAMOL_EXPORTS, PARACETAMOL_IMPORTS
 
+from utils.datastore import store
+
 
 class EXIMAgent:
 
-    def _mock_yearly(self):
+    def _mock_yearly(self, rng):
         return {
-            "2022": random.randint(5000, 15000),
-            "2023": random.randint(6000, 16000),
-            "2024": random.randint(7000, 17000),
+            "2022": rng.randint(5000, 15000),
+            "2023": rng.randint(6000, 16000),
+            "2024": rng.randint(7000, 17000),
         }
 
-    def _mock_countries(self):
+    def _mock_countries(self, rng):
         countries = ["USA", "UK", "China", "Germany", "Brazil", "UAE"]
-        random.shuffle(countries)
+        rng.shuffle(countries)
         return {
-            "2024": [[c, random.randint(300, 5000)] for c in countries[:5]]
+            "2024": [[c, rng.randint(300, 5000)] for c in countries[:5]]
         }
 
     def _get_real_paracetamol(self):
@@ -52,17 +53,21 @@ class EXIMAgent:
             data = self._get_real_paracetamol()
 
         else:
+            # Seeded by drug: the same drug always gets the same mock figures,
+            # so prompts built from them stay cacheable across runs
+            rng = random.Random(f"exim:{drug.lower()}")
+
             # FULL MOCK STRUCTURE ALWAYS PRESENT
             data = {
                 "export_data": {
-                    "export_volume_kgs": self._mock_yearly(),
-                    "export_value_crores": self._mock_yearly(),
-                    "top_export_countries": self._mock_countries(),
+                    "export_volume_kgs": self._mock_yearly(rng),
+                    "export_value_crores": self._mock_yearly(rng),
+                    "top_export_countries": self._mock_countries(rng),
                 },
                 "import_data": {
-                    "import_volume_kgs": self._mock_yearly(),
-                    "import_value_crores": self._mock_yearly(),
-                    "top_import_countries": self._mock_countries(),
+                    "import_volume_kgs": self._mock_yearly(rng),
+                    "import_value_crores": self._mock_yearly(rng),
+                    "top_import_countries": self._mock_countries(rng),
                 },
 
                 "summary": [
@@ -75,8 +80,8 @@ class EXIMAgent:
                 "trade_history": [
                     {
                         "year": y,
-                        "export_volume_mt": random.randint(8, 22),
-                        "import_dependence_percent": random.randint(20, 70)
+                        "export_volume_mt": rng.randint(8, 22),
+                        "import_dependence_percent": rng.randint(20, 70)
                     }
                     for y in range(2020, 2025)
                 ],
@@ -89,8 +94,6 @@ class EXIMAgent:
             }
 
         # Save file
-        os.makedirs(f"data/{drug}", exist_ok=True)
-        with open(f"data/{drug}/exim_trade.json", "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        store.put(drug, "exim", data)
 
         return data
@@ -1,6 +1,11 @@
-import os, json, re
-from dotenv import load_dotenv
-from groq import Groq
+import os, json, re, hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+from files.llm_client import chat, extract_json
+from utils.datastore import store
+from utils.pdf_extract import extract_pdf_text
+from utils.chunking import split_units, pack_chunks
+from utils.bm25 import BM25, tokenize
 
 
 # ---------- OCR SAFE BLOCK ----------
@@ -25,9 +30,6 @@ except:
     PyPDF2 = None
     Document = None
 
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 
 class InternalAgent:
 
@@ -35,59 +37,87 @@ class InternalAgent:
     # READ DOCUMENTS (TEXT PDFs, DOCX, TXT)
     # --------------------------------------------------
     def _read_internal_docs(self, drug):
+        """
+        One record per file in internal_docs: {"filename", "sha256", "text",
+        "summary"}. Documents are looked up by the SHA-256 of their content,
+        so text is only extracted for files the store has never seen. The
+        summary depends on the drug (passages are picked for it) and is
+        stored per (document, drug).
+        """
         folder = f"data/{drug}/internal_docs"
         os.makedirs(folder, exist_ok=True)
 
-        texts = []
+        docs = []
 
-        for file in os.listdir(folder):
+        for file in sorted(os.listdir(folder)):
             path = os.path.join(folder, file)
-            content = ""
+            if not os.path.isfile(path):
+                continue
+
+            with open(path, "rb") as f:
+                sha = hashlib.sha256(f.read()).hexdigest()
+
+            doc = store.internal_doc(sha)
+            if doc is None or doc["text"] is None:
+                text = self._extract_text(path)
+                store.put_internal_doc(sha, file, text=text)
+                doc = {"sha256": sha, "filename": file, "text": text}
+                print(f"📄 Extracted {file}: {len(text)} chars")
+            else:
+                print(f"📄 {file}: known document, reusing extracted text")
 
-            if file.lower().endswith(".txt"):
-                with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                    content = f.read()
+            doc["filename"] = file
+            doc["summary"] = store.doc_summary(sha, drug)
+            docs.append(doc)
 
-            elif file.lower().endswith(".pdf") and PyPDF2:
-                try:
-                    reader = PyPDF2.PdfReader(open(path, "rb"))
-                    content = " ".join(p.extract_text() or "" for p in reader.pages)
-                except Exception as e:
-                    print("❌ PyPDF2 error:", e)
+        return docs
 
-            elif file.lower().endswith(".docx") and Document:
-                try:
-                    doc = Document(path)
-                    content = " ".join(p.text for p in doc.paragraphs)
-                except Exception as e:
-                    print("❌ DOCX error:", e)
+    def _extract_text(self, path):
+        file = os.path.basename(path)
+        content = ""
 
-            if content.strip():
-                texts.append(content.strip())
+        if file.lower().endswith(".txt"):
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                content = f.read()
 
-        return texts
+        elif file.lower().endswith(".pdf") and PyPDF2:
+            # Page ranges extracted in parallel, within a page budget + timeout.
+            # The whole text is needed before summarizing: it is stored by
+            # content hash and passages are ranked across the full document,
+            # so pages are not streamed into the summary step.
+            content = extract_pdf_text(path)
+
+            # ---- OCR if text weak (scanned PDF) ----
+            if OCR_ENABLED and len(content.strip()) < 300:
+                content += " " + self._ocr_pdf(path)
+
+        elif file.lower().endswith(".docx") and Document:
+            try:
+                doc = Document(path)
+                content = "\n".join(p.text for p in doc.paragraphs)
+            except Exception as e:
+                print("❌ DOCX error:", e)
+
+        return content.strip()
 
 
     # --------------------------------------------------
     # OCR FALLBACK (SCANNED PDFs)
     # --------------------------------------------------
-    def _ocr_pdf(self, folder):
+    def _ocr_pdf(self, path):
         text = ""
-        for file in os.listdir(folder):
-            if file.lower().endswith(".pdf"):
-                path = os.path.join(folder, file)
-                print("🔍 OCR processing:", path)
-                try:
-                    images = convert_from_path(path,dpi=300,poppler_path=r"C:\Users\gnane\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin")
-                    print("📄 OCR pages:", len(images))
-
-                    for i, img in enumerate(images[:5]):  # limit for speed
-                        page_text = pytesseract.image_to_string(img)
-                        print(f"OCR page {i} length:", len(page_text))
-                        text += page_text
-
-                except Exception as e:
-                    print("❌ OCR ERROR:", e)
+        print("🔍 OCR processing:", path)
+        try:
+            images = convert_from_path(path,dpi=300,poppler_path=r"C:\Users\gnane\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin")
+            print("📄 OCR pages:", len(images))
+
+            for i, img in enumerate(images[:5]):  # limit for speed
+                page_text = pytesseract.image_to_string(img)
+                print(f"OCR page {i} length:", len(page_text))
+                text += page_text
+
+        except Exception as e:
+            print("❌ OCR ERROR:", e)
 
         return text.strip()
 
@@ -95,22 +125,37 @@ class InternalAgent:
     # --------------------------------------------------
     # AI PROMPT
     # --------------------------------------------------
-    def _build_prompt(self, text):
-        return f"""
-Return ONLY valid JSON.
-
+    SUMMARY_FORMAT = """
 Format:
-{{
+{
   "executive_points": [],
   "key_findings": [],
   "risks": [],
   "opportunities": [],
   "repurposing_signals": [],
   "confidence_note": ""
-}}
+}
+"""
 
+    def _build_prompt(self, text):
+        # text is one chunk (≤ CHUNK_CHARS), never a truncated document
+        return f"""
+Return ONLY valid JSON.
+{self.SUMMARY_FORMAT}
 TEXT:
-{text[:12000]}
+{text}
+"""
+
+    def _build_reduce_prompt(self, merged):
+        return f"""
+Return ONLY valid JSON.
+
+These are findings from consecutive sections of ONE internal document.
+Merge them into a single summary of the whole document: remove
+duplicates, keep the most important, at most {self.REDUCE_MAX_ITEMS} items per list.
+{self.SUMMARY_FORMAT}
+SECTION FINDINGS:
+{json.dumps(merged, ensure_ascii=False)}
 """
 
 
@@ -118,17 +163,17 @@ TEXT:
     # GROQ SUMMARIZATION
     # --------------------------------------------------
     def _groq_summarize(self, text):
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[
-                {"role": "system", "content": "You summarize pharmaceutical internal documents."},
-                {"role": "user", "content": self._build_prompt(text)}
-            ],
+        return self._groq_json(self._build_prompt(text))
+
+    def _groq_json(self, prompt):
+        raw = chat(
+            "You summarize pharmaceutical internal documents.",
+            prompt,
             temperature=0.1,
-            max_tokens=900
+            max_tokens=900,
+            cache_if=extract_json
         )
 
-        raw = response.choices[0].message.content
         try:
             match = re.search(r"\{(.|\n)*\}", raw)
             return json.loads(match.group(0))
@@ -136,6 +181,112 @@ TEXT:
             return None
 
 
+    # --------------------------------------------------
+    # RELEVANCE PRE-FILTER (BM25 OVER PASSAGES)
+    # --------------------------------------------------
+    PASSAGE_CHARS = 1500
+    DRUG_WEIGHT = 3            # the drug-name score counts this many times
+    MIN_SCORE_SHARE = 0.25     # passages below this share of the best score are dropped
+    RELEVANCE_TERMS = (
+        "indication repurposing repurposed efficacy trial phase randomized "
+        "patients outcome endpoint adverse event side effect safety toxicity "
+        "contraindication dose mechanism target approval off-label"
+    )
+
+    def _select_passages(self, text, drug, max_chars):
+        """
+        Passages about the drug and its repurposing signals, best BM25
+        score first, until max_chars is used up; returned in document order
+        with the total passage count.
+
+        The drug name and RELEVANCE_TERMS are scored apart: a passage that
+        never names the drug is never sent, however many generic terms
+        (patients, dose, safety) it holds, and passages scoring below
+        MIN_SCORE_SHARE of the best one are dropped.
+        """
+        passages = list(pack_chunks(split_units(text), self.PASSAGE_CHARS))
+        index = BM25([tokenize(p) for p in passages])
+        drug_scores = index.scores(tokenize(drug))
+        term_scores = index.scores(tokenize(self.RELEVANCE_TERMS))
+        scores = [
+            self.DRUG_WEIGHT * d + t if d > 0 else 0.0
+            for d, t in zip(drug_scores, term_scores)
+        ]
+        floor = self.MIN_SCORE_SHARE * max(scores, default=0.0)
+        ranked = sorted(
+            (i for i, score in enumerate(scores) if score > 0 and score >= floor),
+            key=lambda i: -scores[i]
+        )
+
+        picked, size = [], 0
+        for i in ranked:
+            if size + len(passages[i]) > max_chars:
+                continue
+            picked.append(i)
+            size += len(passages[i])
+
+        return [passages[i] for i in sorted(picked)], len(passages)
+
+
+    # --------------------------------------------------
+    # MAP-REDUCE OVER CHUNKS (LARGE DOCUMENTS)
+    # --------------------------------------------------
+    CHUNK_CHARS = 12000
+    MAP_CONCURRENCY = int(os.getenv("INTERNAL_MAP_CONCURRENCY", "4"))
+    # Input tokens per document (~4 chars/token) spent on the selected passages.
+    # The default packs into at most MAP_CONCURRENCY chunks (each chunk
+    # closes with > CHUNK_CHARS - PASSAGE_CHARS), so a document costs one
+    # parallel map wave plus the reduce, inside AGENT_TIMEOUTS["internal_summary"].
+    TOKEN_BUDGET = int(os.getenv(
+        "INTERNAL_TOKEN_BUDGET", str(MAP_CONCURRENCY * (CHUNK_CHARS - PASSAGE_CHARS) // 4)
+    ))
+    REDUCE_MAX_ITEMS = 8
+
+    def _summarize_document(self, text, drug):
+        passages, total = self._select_passages(text, drug, self.TOKEN_BUDGET * 4)
+        if not passages:
+            return None
+
+        chunks = list(pack_chunks(passages, self.CHUNK_CHARS))
+        print(f"📄 Relevance filter: {len(passages)} of {total} passages "
+              f"({sum(map(len, passages))} of {len(text)} chars) → {len(chunks)} chunk(s)")
+
+        if len(chunks) == 1:
+            summary = self._summarize_chunk(chunks[0])
+        else:
+            # ---- Map: chunk summaries, bounded parallelism ----
+            with ThreadPoolExecutor(max_workers=self.MAP_CONCURRENCY) as pool:
+                partials = [p for p in pool.map(self._summarize_chunk, chunks) if p]
+
+            if not partials:
+                return None
+
+            # ---- Reduce: one summary in the same schema ----
+            merged = self._merge_summaries(partials)
+            summary = (
+                partials[0] if len(partials) == 1
+                else self._groq_json(self._build_reduce_prompt(merged)) or merged
+            )
+
+        if summary and len(passages) < total:
+            note = f"Based on the {len(passages)} of {total} passages most relevant to {drug}."
+            summary["confidence_note"] = f"{summary.get('confidence_note') or ''} {note}".strip()
+
+        return summary
+
+    def _summarize_chunk(self, chunk):
+        """Chunk summaries are stored by content hash and reused across documents."""
+        sha = hashlib.sha256(chunk.encode("utf-8")).hexdigest()
+
+        summary = store.chunk_summary(sha)
+        if summary is None:
+            summary = self._groq_summarize(chunk)
+            if summary:
+                store.put_chunk_summary(sha, summary)
+
+        return summary
+
+
     # --------------------------------------------------
     # FALLBACK SUMMARY
     # --------------------------------------------------
@@ -150,50 +301,85 @@ TEXT:
         }
 
 
+    # --------------------------------------------------
+    # MERGE PER-DOCUMENT SUMMARIES
+    # --------------------------------------------------
+    SUMMARY_LISTS = (
+        "executive_points", "key_findings", "risks",
+        "opportunities", "repurposing_signals"
+    )
+
+    def _merge_summaries(self, summaries):
+        merged = {key: [] for key in self.SUMMARY_LISTS}
+        notes = []
+
+        for summary in summaries:
+            for key in self.SUMMARY_LISTS:
+                for item in summary.get(key) or []:
+                    if item not in merged[key]:
+                        merged[key].append(item)
+            note = summary.get("confidence_note")
+            if note and note not in notes:
+                notes.append(note)
+
+        merged["confidence_note"] = " ".join(notes)
+        return merged
+
+
     # --------------------------------------------------
     # MAIN ENTRY
     # --------------------------------------------------
     def summarize(self, drug):
         folder = f"data/{drug}/internal_docs"
 
-        if not os.listdir(folder):
+        if not os.path.isdir(folder) or not os.listdir(folder):
             return {"source": "mock_internal", "document_count": 0}
 
-        # ---- Step 1: Extract text normally ----
-        texts = self._read_internal_docs(drug)
-        combined_text = " ".join(texts).strip()
-
-        print("📄 TEXT LENGTH (PyPDF2):", len(combined_text))
-
-        # ---- Step 2: OCR if text weak ----
-        if len(combined_text) < 300:
-            ocr_text = self._ocr_pdf(folder)
-            combined_text += " " + ocr_text
-
-        combined_text = combined_text.strip()
+        # ---- Step 1: Text per document (cached by content hash) ----
+        docs = self._read_internal_docs(drug)
+        combined_text = " ".join(d["text"] for d in docs if d["text"]).strip()
         print("📄 FINAL TEXT LENGTH:", len(combined_text))
 
         drug_lower = drug.lower()
-        text_lower = combined_text.lower()
-
-        # ---- Step 3: Drug-name detection (robust) ----
-        drug_found = (
-            drug_lower in text_lower or
-            drug_lower.replace(" ", "") in text_lower.replace(" ", "")
-        )
 
-        # ---- Step 4: Decision ----
-        if drug_found and len(combined_text) > 300:
-            summary = self._groq_summarize(combined_text)
-            if not summary:
-                summary = self._fallback_summary(
-                    "Drug name detected, but AI summarization failed."
-                )
+        # ---- Step 2: Summarize each relevant document once ----
+        summaries = []
+        relevant = 0
+        ai_failed = False
 
-        elif   OCR_ENABLED and len(combined_text) < 300:
-            ocr_text = self._ocr_pdf(folder)
-            combined_text += " " + ocr_text
+        for doc in docs:
+            text = doc["text"] or ""
+            text_lower = text.lower()
 
+            # Drug-name detection (robust)
+            drug_found = (
+                drug_lower in text_lower or
+                drug_lower.replace(" ", "") in text_lower.replace(" ", "")
+            )
+            if not drug_found or len(text) <= 300:
+                continue
+            relevant += 1
+
+            if doc["summary"] is None:
+                doc["summary"] = self._summarize_document(text, drug)
+                if doc["summary"]:
+                    store.put_doc_summary(doc["sha256"], drug, doc["summary"])
+                else:
+                    ai_failed = True
+                    continue
+            else:
+                print(f"📄 {doc['filename']}: reusing stored summary")
+
+            summaries.append(doc["summary"])
+
+        # ---- Step 3: Decision ----
+        if summaries:
+            summary = self._merge_summaries(summaries)
+
+        elif relevant and ai_failed:
+            summary = self._fallback_summary(
+                "Drug name detected, but AI summarization failed."
+            )
 
         else:
             summary = self._fallback_summary(
@@ -208,13 +394,15 @@ TEXT:
         # ---- Metadata ----
         summary.update({
             "source": "uploaded_docs",
-            "document_count": len(os.listdir(folder)),
+            "document_count": len(docs),
+            "documents": [
+                {"filename": d["filename"], "sha256": d["sha256"], "summarized": d["summary"] is not None}
+                for d in docs
+            ],
             "raw_text_preview": combined_text[:3000]
         })
 
         # ---- Save ----
-        os.makedirs(f"data/{drug}", exist_ok=True)
-        with open(f"data/{drug}/internal_summary.json", "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2)
+        store.put(drug, "internal_summary", summary)
 
         return summary
@@ -1,5 +1,6 @@
 # agents/master_agent.py
 import os
+import time
 
 from agents.pubmed_agent import PubMedAgent
 from agents.clinical_trials_agent import ClinicalTrialsAgent
@@ -13,12 +14,55 @@ from agents.exim_agent import EXIMAgent
 from agents.web_agent import WebAgent
 from agents.internal_agent import InternalAgent
 
-from files.recommender import ai_recommendation
-from files.repurpose_decision import repurpose_decision
+from files.recommender import ai_recommendation, FALLBACK as RECOMMENDATION_FALLBACK
+from files.repurpose_decision import repurpose_decision, FALLBACK as DECISION_FALLBACK
+from files.joint_assessment import joint_assessment
+
+from utils.task_graph import TaskGraph
+from utils.datastore import store, SOURCES
 
 
 class MasterAgent:
 
+    # Per-agent timeouts (seconds) and the deadline for the whole agent stage
+    AGENT_TIMEOUTS = {
+        "pubmed": 60,
+        "clinical_trials": 45,
+        "patents": 10,
+        "unmet_needs": 10,
+        "iqvia": 15,
+        "exim": 10,
+        "web_intel": 15,
+        "internal_summary": 90,
+        "market_mock": 5,
+    }
+    PIPELINE_DEADLINE = 150
+    MAX_WORKERS = 8
+
+    # Stages reported through on_event, in display order
+    STAGES = list(AGENT_TIMEOUTS) + ["llm"]
+
+    # How long each source stays fresh (seconds) before a background
+    # refresh re-runs its agent. internal_summary only changes on upload.
+    DAY = 24 * 3600
+    SOURCE_TTLS = {
+        "pubmed": DAY,
+        "unmet_needs": DAY,
+        "web_intel": DAY,
+        "clinical_trials": 7 * DAY,
+        "patents": 7 * DAY,
+        "iqvia": 30 * DAY,
+        "exim": 30 * DAY,
+        "market_mock": 30 * DAY,
+    }
+    # Sources no agent stores itself: run() stamps them in the datastore
+    # (no JSON export), so each ages on its own TTL
+    DERIVED_SOURCES = ("unmet_needs", "market_mock")
+
+    # LLM stage: both calls run in parallel, or one combined prompt
+    LLM_TIMEOUT = 60
+    SINGLE_LLM_PROMPT = os.getenv("LLM_SINGLE_PROMPT", "0") == "1"
+
     def __init__(self):
         self.pubmed = PubMedAgent()
         self.clinical = ClinicalTrialsAgent()
@@ -32,30 +76,77 @@ class MasterAgent:
         self.web = WebAgent()
         self.internal = InternalAgent()
 
-    def run(self, drug_name):
+    def run(self, drug_name, pubmed_ids=None, on_event=None, only=None):
+        """
+        pubmed_ids: esearch ID list already obtained by the caller
+        (the /analyze validation step) so PubMed is not searched twice.
+        on_event(stage, timing): progress callback, fired as each agent
+        (and finally the "llm" stage) settles.
+        only: re-run just these agents; every other source is taken from
+        the last stored run (see stale_sources).
+        """
 
         print(f"\n=== Master Agent: Starting analysis for {drug_name} ===\n")
 
         os.makedirs(f"data/{drug_name}", exist_ok=True)
 
-        # ---------- Run agents ----------
-        try:
-            pubmed = self.pubmed.search_and_fetch(drug_name)
-        except Exception as e:
-            print("❌ PubMed failed:", e)
-            pubmed = []
-
-        trials = self.clinical.get_trials(drug_name)
-        patents = self.patents.search(drug_name)
-        unmet = self.unmet.generate(drug_name, pubmed)
-        iqvia = self.iqvia.get_market_data(drug_name, pubmed)
-        exim = self.exim.get_trade_data(drug_name)
-        web = self.web.search(drug_name)
+        # ---------- Run agents (parallel, dependency aware) ----------
+        graph = TaskGraph(max_workers=self.MAX_WORKERS, deadline=self.PIPELINE_DEADLINE)
+        t = self.AGENT_TIMEOUTS
+
+        previous = store.get(drug_name, "combined", {}) if only is not None else {}
+
+        def add(name, fn, deps=(), timeout=None, default=None):
+            if only is not None and name not in only:
+                # Still fresh → reuse the stored value
+                if name in SOURCES or name in self.DERIVED_SOURCES:
+                    value = store.get(drug_name, name, previous.get(name, default))
+                else:
+                    value = previous.get(name, default)
+                fn, timeout = (lambda *_: value), None
+            graph.add(name, fn, deps=deps, timeout=timeout, default=default)
+
+        add("pubmed", lambda: self.pubmed.search_and_fetch(drug_name, ids=pubmed_ids),
+            timeout=t["pubmed"], default=[])
+        add("clinical_trials", lambda: self.clinical.get_trials(drug_name),
+            timeout=t["clinical_trials"], default=[])
+        add("patents", lambda: self.patents.search(drug_name),
+            timeout=t["patents"], default=[])
+        add("exim", lambda: self.exim.get_trade_data(drug_name),
+            timeout=t["exim"], default={})
+        add("web_intel", lambda: self.web.search(drug_name),
+            timeout=t["web_intel"], default=[])
 
         # ✅ THIS is where PDF text + summary comes from
-        internal = self.internal.summarize(drug_name)
+        add("internal_summary", lambda: self.internal.summarize(drug_name),
+            timeout=t["internal_summary"],
+            default={"source": "mock_internal", "document_count": 0})
+
+        add("market_mock", lambda: self.market.get_market_data(drug_name),
+            timeout=t["market_mock"], default={})
+
+        # Indications are mined from the PubMed records and trial conditions
+        add("unmet_needs", lambda pm, tr: self.unmet.generate(drug_name, pm, tr),
+            deps=["pubmed", "clinical_trials"], timeout=t["unmet_needs"], default=[])
+        add("iqvia", lambda pm: self.iqvia.get_market_data(drug_name, pm),
+            deps=["pubmed"], timeout=t["iqvia"], default={})
+
+        out, timings = graph.run(on_event=on_event)
 
-        market_mock = self.market.get_market_data(drug_name)
+        for name in self.DERIVED_SOURCES:
+            ran = only is None or name in only
+            if ran and timings.get(name, {}).get("status") == "ok":
+                store.put(drug_name, name, out[name], export=False)
+
+        pubmed = out["pubmed"]
+        trials = out["clinical_trials"]
+        patents = out["patents"]
+        unmet = out["unmet_needs"]
+        iqvia = out["iqvia"]
+        exim = out["exim"]
+        web = out["web_intel"]
+        internal = out["internal_summary"]
+        market_mock = out["market_mock"]
 
         # ---------- Combine ----------
         combined = {
@@ -72,7 +163,10 @@ class MasterAgent:
             # ✅ INTERNAL SUMMARY PASSED DIRECTLY
             "internal_summary": internal,
 
-            "market_mock": market_mock
+            "market_mock": market_mock,
+
+            # Per-stage timing (seconds + status) for this run
+            "timings": timings
         }
 
         # ---------- FINAL SUMMARY (NO INTERNAL DATA HERE) ----------
@@ -80,11 +174,76 @@ class MasterAgent:
             pubmed, trials, patents, iqvia, exim, unmet
         )
 
-        combined["ai_recommendation"] = ai_recommendation(combined)
-        combined["repurpose_decision"] = repurpose_decision(combined)
+        rec, dec, llm_timing = self.run_llm_stage(combined)
+        combined["ai_recommendation"] = rec
+        combined["repurpose_decision"] = dec
+        timings["llm"] = llm_timing
+        if on_event:
+            on_event("llm", llm_timing)
+
+        # ---------- Persist once (datastore + atomic combined_summary.json) ----------
+        store.put(drug_name, "combined", combined)
 
         return combined
 
+    # ======================================================================
+    # FRESHNESS
+    # ======================================================================
+    def stale_sources(self, drug_name, now=None):
+        """
+        Sources whose TTL has run out, each timed from its own store
+        entry. Derived sources (DERIVED_SOURCES) stored before they had
+        one fall back to the last combined run.
+        """
+        now = now or time.time()
+
+        stale = []
+        for source, ttl in self.SOURCE_TTLS.items():
+            at = store.updated_at(drug_name, source)
+            if at is None and source in self.DERIVED_SOURCES:
+                at = store.updated_at(drug_name, "combined")
+            if at is None or now - at > ttl:
+                stale.append(source)
+        return stale
+
+    # ======================================================================
+    # LLM STAGE (RECOMMENDATION + DECISION)
+    # ======================================================================
+    def run_llm_stage(self, combined):
+
+        t0 = time.monotonic()
+
+        if self.SINGLE_LLM_PROMPT:
+            try:
+                rec, dec = joint_assessment(combined)
+                status = "ok"
+            except Exception as e:
+                print("❌ Joint LLM assessment failed:", e)
+                rec = dict(RECOMMENDATION_FALLBACK)
+                dec = dict(DECISION_FALLBACK)
+                status = "error"
+
+            return rec, dec, {"status": status, "seconds": round(time.monotonic() - t0, 3)}
+
+        # Both prompts only read `combined` → issue them at the same time
+        graph = TaskGraph(max_workers=2)
+        graph.add("ai_recommendation", lambda: ai_recommendation(combined),
+                  timeout=self.LLM_TIMEOUT, default=dict(RECOMMENDATION_FALLBACK))
+        graph.add("repurpose_decision", lambda: repurpose_decision(combined),
+                  timeout=self.LLM_TIMEOUT, default=dict(DECISION_FALLBACK))
+
+        out, llm_timings = graph.run()
+        statuses = {llm_timings[k]["status"] for k in out}
+        if statuses == {"ok"}:
+            status = "ok"
+        else:
+            status = "partial" if "ok" in statuses else "error"
+
+        return out["ai_recommendation"], out["repurpose_decision"], {
+            "status": status,
+            "seconds": llm_timings["_total"]["seconds"]
+        }
+
     # ======================================================================
     # BUILD FINAL SUMMARY (PUBLIC DATA ONLY)
     # ======================================================================
@@ -1,7 +1,7 @@
-import json
-import os
 import random
 
+from utils.datastore import store
+
 
 class PatentAgent:
 
@@ -59,8 +59,6 @@ class PatentAgent:
             })
 
         # Save JSON
-        os.makedirs(f"data/{drug}", exist_ok=True)
-        with open(f"data/{drug}/patents.json", "w", encoding="utf-8") as f:
-            json.dump(mock_patents, f, indent=2, ensure_ascii=False)
+        store.put(drug, "patents", mock_patents)
 
         return mock_patents
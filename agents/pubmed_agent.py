@@ -1,19 +1,40 @@
 # agents/pubmed_agent.py
-import time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from bs4 import BeautifulSoup
-import json
 import os
+import threading
+import time
+from datetime import datetime
+from dotenv import load_dotenv
+
+from utils.pubmed_xml import iter_efetch_articles
+from utils.rate_limit import TokenBucket
+from utils.datastore import store
+
+load_dotenv()
 
 
 class PubMedAgent:
 
     SEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-    SUMMARY_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
     FETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 
+    API_KEY = os.getenv("NCBI_API_KEY")
+
+    SEARCH_LIMIT = 50
+    EFETCH_BATCH = 200              # records per efetch call
+
+    # NCBI allows 3 req/s per IP, 10 req/s with an API key.
+    # Class-level so every PubMedAgent in the process shares the quota.
+    RATE_LIMITER = TokenBucket(rate=10 if API_KEY else 3)
+
+    # Short-lived memo of esearch results, shared by the /analyze
+    # validator and the pipeline: normalized query -> (expires_at, hit)
+    SEARCH_MEMO_TTL = 600
+    _search_memo = {}
+    _search_memo_lock = threading.Lock()
+
     def __init__(self):
         self.session = self._create_session()
 
@@ -27,7 +48,7 @@ class PubMedAgent:
             total=5,
             backoff_factor=1,
             status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["GET"]
+            allowed_methods=["GET", "POST"]     # E-utilities POSTs are read-only
         )
 
         adapter = HTTPAdapter(max_retries=retries)
@@ -35,108 +56,204 @@ class PubMedAgent:
 
         return session
 
+    def _params(self, **params):
+        params["db"] = "pubmed"
+        if self.API_KEY:
+            params["api_key"] = self.API_KEY
+        return params
+
+    def _request(self, method, url, timeout=20, **kwargs):
+        self.RATE_LIMITER.acquire()
+        resp = self.session.request(method, url, timeout=timeout, **kwargs)
+        resp.raise_for_status()
+        return resp
+
     # --------------------------------------------------
-    # SEARCH PUBMED (LIMITED)
+    # SEARCH PUBMED (LIMITED, HISTORY SERVER)
     # --------------------------------------------------
-    def search(self, drug):
-        
-        query = f'"{drug}"[Title] AND ("drug"[MeSH Terms] OR "pharmacology"[MeSH Terms])'
-
-        params = {
-            "db": "pubmed",
-            "term": query,
-            "sort": "relevance",
-            "retmax": 50,          
-            "retmode": "json"
+    @staticmethod
+    def _memo_key(drug):
+        return " ".join(drug.lower().split())
+
+    def esearch(self, drug):
+        """
+        Run esearch with usehistory=y (memoized for SEARCH_MEMO_TTL seconds).
+        Returns {"ids": [...], "webenv": str|None, "query_key": str|None}.
+        """
+        key = self._memo_key(drug)
+        now = time.monotonic()
+
+        with self._search_memo_lock:
+            cached = self._search_memo.get(key)
+            if cached and cached[0] > now:
+                return dict(cached[1], ids=list(cached[1]["ids"]))
+
+        hit = self._esearch(drug)
+
+        with self._search_memo_lock:
+            # Drop expired entries while we are here
+            for k in [k for k, (exp, _) in self._search_memo.items() if exp <= now]:
+                del self._search_memo[k]
+            self._search_memo[key] = (now + self.SEARCH_MEMO_TTL, hit)
+
+        return dict(hit, ids=list(hit["ids"]))
+
+    @staticmethod
+    def _query(drug):
+        return f'"{drug}"[Title] AND ("drug"[MeSH Terms] OR "pharmacology"[MeSH Terms])'
+
+    def _esearch(self, drug):
+        query = self._query(drug)
+
+        params = self._params(
+            term=query,
+            sort="relevance",
+            retmax=self.SEARCH_LIMIT,
+            retmode="json",
+            usehistory="y"
+        )
+
+        resp = self._request("GET", self.SEARCH_URL, params=params, timeout=15)
+        result = resp.json().get("esearchresult", {})
+
+        return {
+            "ids": result.get("idlist", []),
+            "webenv": result.get("webenv"),
+            "query_key": result.get("querykey"),
         }
 
-        resp = self.session.get(
-            self.SEARCH_URL,
-            params=params,
-            timeout=15
+    def search(self, drug):
+        return self.esearch(drug)["ids"]
+
+    def modified_since(self, drug, mindate):
+        """PMIDs matching the drug query whose record changed since `mindate` (YYYY/MM/DD)."""
+        params = self._params(
+            term=self._query(drug),
+            datetype="mdat",
+            mindate=mindate,
+            maxdate=datetime.now().strftime("%Y/%m/%d"),
+            retmax=self.SEARCH_LIMIT,
+            retmode="json"
         )
-        resp.raise_for_status()
 
-        data = resp.json()
-        return data.get("esearchresult", {}).get("idlist", [])
+        resp = self._request("GET", self.SEARCH_URL, params=params, timeout=15)
+        return set(resp.json().get("esearchresult", {}).get("idlist", []))
+
+    def _memoized_hit(self, drug, ids):
+        """History-server handle for `ids` if the memo still has it."""
+        with self._search_memo_lock:
+            cached = self._search_memo.get(self._memo_key(drug))
+
+        if cached and cached[0] > time.monotonic() and cached[1]["ids"] == list(ids):
+            return dict(cached[1], ids=list(ids))
+
+        return {"ids": list(ids), "webenv": None, "query_key": None}
 
     # --------------------------------------------------
-    # FETCH METADATA + ABSTRACTS (BATCHED)
+    # FETCH RECORDS (EFETCH ONLY, STREAM-PARSED)
     # --------------------------------------------------
+    def _efetch(self, method, **params):
+        """One efetch call, parsed straight off the response stream."""
+        kwargs = {"stream": True, "timeout": 30}
+        if method == "POST":
+            kwargs["data"] = self._params(retmode="xml", **params)
+        else:
+            kwargs["params"] = self._params(retmode="xml", **params)
+
+        with self._request(method, self.FETCH_URL, **kwargs) as resp:
+            resp.raw.decode_content = True      # undo gzip before parsing
+            return list(iter_efetch_articles(resp.raw))
+
     def fetch(self, ids):
+        """Fetch explicit PMIDs, EFETCH_BATCH per POST."""
         all_records = []
 
-        for i in range(0, len(ids), 10):   # 🔴 SMALL BATCH
-            batch = ids[i:i + 10]
-            id_str = ",".join(batch)
-
+        for i in range(0, len(ids), self.EFETCH_BATCH):
+            batch = ids[i:i + self.EFETCH_BATCH]
             try:
-                # ---- Metadata ----
-                meta_resp = self.session.get(
-                    self.SUMMARY_URL,
-                    params={"db": "pubmed", "id": id_str, "retmode": "xml"},
-                    timeout=20
-                )
-                meta_resp.raise_for_status()
-                meta_soup = BeautifulSoup(meta_resp.text, "xml")
-
-                # ---- Abstracts ----
-                abs_resp = self.session.get(
-                    self.FETCH_URL,
-                    params={"db": "pubmed", "id": id_str, "retmode": "xml"},
-                    timeout=20
-                )
-                abs_resp.raise_for_status()
-                abs_soup = BeautifulSoup(abs_resp.text, "xml")
-
-                # Map PMID → abstract
-                abstracts = {}
-                for art in abs_soup.find_all("PubmedArticle"):
-                    pmid = art.PMID.text if art.PMID else None
-                    abstract_node = art.find("AbstractText")
-                    abstracts[pmid] = (
-                        abstract_node.get_text(" ", strip=True)
-                        if abstract_node else "No abstract available."
-                    )
-
-                # Combine
-                for doc in meta_soup.find_all("DocSum"):
-                    pmid = doc.find("Id").text
-                    title = doc.find("Item", {"Name": "Title"}).text
-                    date = doc.find("Item", {"Name": "PubDate"}).text
-                    journal = doc.find("Item", {"Name": "Source"}).text
-                    authors = [a.text for a in doc.find_all("Item", {"Name": "Author"})]
-
-                    all_records.append({
-                        "pmid": pmid,
-                        "title": title,
-                        "date": date,
-                        "journal": journal,
-                        "authors": authors,
-                        "abstract": abstracts.get(pmid)
-                    })
-
-                time.sleep(0.3)  # 🧠 Respect NCBI
+                all_records.extend(self._efetch("POST", id=",".join(batch)))
+            except Exception as e:
+                print("❌ PubMed batch failed:", e)
+
+        return all_records
 
+    def fetch_history(self, webenv, query_key, count):
+        """Fetch the first `count` records of an esearch result on the history server."""
+        all_records = []
+
+        for start in range(0, count, self.EFETCH_BATCH):
+            try:
+                all_records.extend(self._efetch(
+                    "GET",
+                    WebEnv=webenv,
+                    query_key=query_key,
+                    retstart=start,
+                    retmax=min(self.EFETCH_BATCH, count - start)
+                ))
             except Exception as e:
                 print("❌ PubMed batch failed:", e)
-                continue
 
         return all_records
 
     # --------------------------------------------------
-    # MAIN ENTRY (FAIL-SAFE)
+    # MAIN ENTRY (FAIL-SAFE, INCREMENTAL)
     # --------------------------------------------------
-    def search_and_fetch(self, drug):
+    def search_and_fetch(self, drug, ids=None):
+        """
+        `ids` is an esearch ID list the caller already has (e.g. from the
+        /analyze validation step); the search is then not repeated.
+
+        Only PMIDs missing from the datastore, or modified on PubMed
+        since the last refresh, are fetched.
+        """
         try:
-            ids = self.search(drug)
+            if ids is None:
+                hit = self.esearch(drug)
+            else:
+                hit = self._memoized_hit(drug, ids)
+
+            ids = hit["ids"]
             print(f"PubMed: Found {len(ids)} articles.")
 
-            records = self.fetch(ids)
+            # Every PMID stored for the drug (current result set or not)
+            known = store.all_articles(drug)
+            refreshed = store.get_meta(drug, "pubmed_refreshed")
+
+            missing = [pmid for pmid in ids if pmid not in known]
+
+            modified = set()
+            if known and refreshed:
+                try:
+                    modified = self.modified_since(drug, refreshed) & set(ids) & set(known)
+                except Exception as e:
+                    print("❌ PubMed modified-since check failed:", e)
+
+            if not known and hit["webenv"] and hit["query_key"]:
+                fetched = self.fetch_history(hit["webenv"], hit["query_key"], len(ids))
+            else:
+                wanted = missing + [pmid for pmid in ids if pmid in modified]
+                fetched = self.fetch(wanted) if wanted else []
+
+            new = updated = 0
+            for rec in fetched:
+                pmid = rec["pmid"]
+                if pmid not in known:
+                    new += 1
+                elif known[pmid] != rec:
+                    updated += 1
+                known[pmid] = rec
+
+            unchanged = sum(1 for pmid in ids if pmid in known) - new - updated
+            print(f"PubMed: {new} new, {updated} updated, {unchanged} unchanged "
+                  f"({len(fetched)} fetched).")
+
+            # Current result set, esearch relevance order
+            records = [known[pmid] for pmid in ids if pmid in known]
+            store.put(drug, "pubmed", records)
 
-            os.makedirs(f"data/{drug}", exist_ok=True)
-            with open(f"data/{drug}/pubmed.json", "w", encoding="utf-8") as f:
-                json.dump(records, f, indent=2)
+            store.set_meta(drug, "pubmed_refreshed", datetime.now().strftime("%Y/%m/%d"))
+            store.set_meta(drug, "pubmed_last_refresh",
+                           {"new": new, "updated": updated, "unchanged": unchanged})
 
             return records
 
@@ -1,12 +1,39 @@
+from utils.indications import mine
+
+
 class UnmetNeedAgent:
 
-    def generate(self, drug, pubmed_records):
+    # Used when the evidence mentions no indication at all
+    FALLBACK = [
+        "Need for improved safety profile",
+        "Lack of long-acting formulations",
+        "Limited studies in pediatric population",
+        "Potential off-label benefit in new therapeutic areas"
+    ]
+    MAX_CANDIDATES = 6
+
+    def generate(self, drug, pubmed_records, trials=None):
+        """
+        Candidate new indications mined from trial conditions and PubMed
+        titles/abstracts (utils/indications), as report lines: the main
+        indication first, then under-explored ones, best first.
+        """
+        main, candidates = mine(trials, pubmed_records, top=self.MAX_CANDIDATES)
+        if main is None:
+            return list(self.FALLBACK)
 
         unmet = [
-            "Need for improved safety profile",
-            "Lack of long-acting formulations",
-            "Limited studies in pediatric population",
-            "Potential off-label benefit in new therapeutic areas"
+            f"Main evidence base: {main['indication']} "
+            f"({main['trials']} trials, {main['articles']} articles)"
         ]
+        for c in candidates:
+            unmet.append(
+                f"Under-explored indication: {c['indication']} — "
+                f"{c['trials']} trials, {c['articles']} articles "
+                f"({round(100 * c['share'])}% of the evidence for {main['indication']})"
+            )
+
+        if not candidates:
+            unmet.append(f"No under-explored indication stands out beyond {main['indication']}")
 
         return unmet
@@ -1,6 +1,6 @@
 # agents/web_agent.py
-import os, json
-from collections import defaultdict
+from utils.datastore import store
+
 
 class WebAgent:
     """
@@ -39,7 +39,5 @@ class WebAgent:
 
     def search(self, drug):
         res = self._mock_results(drug)
-        os.makedirs(f"data/{drug}", exist_ok=True)
-        with open(f"data/{drug}/web_intel.json","w",encoding="utf-8") as f:
-            json.dump(res, f, indent=2)
+        store.put(drug, "web_intel", res)
         return res
@@ -1,6 +1,15 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, send_file, jsonify, redirect, url_for
+from markupsafe import escape
 from agents.master_agent import MasterAgent
-import os, json
+from utils.datastore import store
+from utils.jobs import jobs
+from utils.singleflight import SingleFlight, KeyedLocks
+from utils.parsed_cache import parsed_cache
+from utils.ranking import rank, FEATURES, WEIGHTS
+from files.llm_client import cache_stats as llm_cache_stats
+from files.recommender import FALLBACK as RECOMMENDATION_FALLBACK
+from files.repurpose_decision import FALLBACK as DECISION_FALLBACK
+import os, hashlib, shutil, time
 
 app = Flask(__name__)
 agent = MasterAgent()
@@ -40,6 +49,79 @@ def allowed_file(filename):
     )
 
 
+# ===================== PIPELINE (ONE RUN PER DRUG + DOCS) =====================
+UPLOAD_STAGING = "data/_uploads"
+
+flight = SingleFlight()
+drug_locks = KeyedLocks()
+
+
+def hash_uploads(uploads):
+    """Content hash of an upload set ([(filename, bytes)]); "" when nothing was uploaded."""
+    if not uploads:
+        return ""
+    h = hashlib.sha256()
+    for name, content in sorted(uploads):
+        h.update(name.encode("utf-8"))
+        h.update(hashlib.sha256(content).digest())
+    return h.hexdigest()
+
+
+def stage_uploads(docs_hash, uploads):
+    """Park uploads under their hash until the run that owns them starts."""
+    if not uploads:
+        return
+    folder = os.path.join(UPLOAD_STAGING, docs_hash)
+    os.makedirs(folder, exist_ok=True)
+    for name, content in uploads:
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(content)
+
+
+def install_uploads(drug, docs_hash):
+    """
+    Add the staged upload set to data/<drug>/internal_docs.
+
+    Earlier documents are kept: InternalAgent keys its extracted text and
+    summaries on file content, so unchanged files cost nothing on the
+    next run. A file uploaded under an existing name replaces it.
+    """
+    internal_folder = f"data/{drug}/internal_docs"
+    os.makedirs(internal_folder, exist_ok=True)
+
+    staged = os.path.join(UPLOAD_STAGING, docs_hash)
+    if os.path.isdir(staged):
+        for name in os.listdir(staged):
+            shutil.copy(os.path.join(staged, name), internal_folder)
+        shutil.rmtree(staged, ignore_errors=True)
+
+
+def run_pipeline(drug, docs_hash=None, pubmed_ids=None, progress=None, only=None):
+    """
+    Run MasterAgent once per (drug, uploaded docs) at a time.
+
+    Callers arriving while an identical run is in flight get its result
+    instead of starting another. Runs of the same drug with different
+    documents are serialized, since they share data/<drug>/.
+    docs_hash: staged uploads to add to internal_docs first (see stage_uploads).
+    only: refresh just these sources (see MasterAgent.stale_sources).
+    """
+    def run():
+        with drug_locks(drug):
+            if docs_hash:
+                install_uploads(drug, docs_hash)
+            return agent.run(drug, pubmed_ids=pubmed_ids, on_event=progress, only=only)
+
+    key = f"{drug}:{docs_hash or ''}"
+    if only is not None:
+        key += ":refresh:" + ",".join(sorted(only))
+
+    results, shared = flight.do(key, run)
+    if shared:
+        print(f"🔗 {drug}: joined an analysis already in progress")
+    return results
+
+
 @app.route("/analyze", methods=["POST"])
 def analyze():
 
@@ -57,91 +139,207 @@ def analyze():
         return render_template("index.html", error="Drug name is mandatory.")
 
     # ---------- QUICK DRUG VALIDATION (PUBMED) ----------
-    pubmed_count = agent.pubmed.search(drug)
-    if not pubmed_count:
+    # The ID list is handed to the pipeline so esearch runs only once
+    pubmed_ids = agent.pubmed.search(drug)
+    if not pubmed_ids:
         return render_template(
             "drug_not_found.html",
             drug=drug
         )
 
-    # ---------- 2. Prepare folders ----------
-    base_path = f"data/{drug}"
-    internal_folder = f"{base_path}/internal_docs"
-    os.makedirs(internal_folder, exist_ok=True)
-    
-    # ---------- 3. 🔥 CLEAR OLD INTERNAL FILES (OPTION 1 FIX) ----------
-    for old_file in os.listdir(internal_folder):
-        old_path = os.path.join(internal_folder, old_file)
-        if os.path.isfile(old_path):
-            os.remove(old_path)
-
-    # ---------- 4. Handle uploaded files (OPTIONAL + SAFE) ----------
-    files = request.files.getlist("files")
-    has_internal_docs = False
-
-    for f in files:
+    # ---------- 2. Read uploaded files (OPTIONAL + SAFE) ----------
+    uploads = []
+    for f in request.files.getlist("files"):
         if f and f.filename:
             if allowed_file(f.filename):
-                filename = secure_filename(f.filename)
-                f.save(os.path.join(internal_folder, filename))
-                has_internal_docs = True
+                uploads.append((secure_filename(f.filename), f.read()))
             # Unsupported files are safely ignored
 
-    # ---------- 4. Run all intelligence agents ----------
-    results = agent.run(drug)
+    # ---------- 3. Queue the pipeline (runs off the request thread) ----------
+    # Same drug + same documents → attach to the job already running.
+    # Uploads reach internal_docs only when the owning run starts, so a
+    # run in flight never sees its files change underneath it. Only the
+    # job that owns them stages them: an attaching request leaves nothing
+    # behind in UPLOAD_STAGING.
+    docs_hash = hash_uploads(uploads)
+
+    def run(progress):
+        stage_uploads(docs_hash, uploads)
+        return run_pipeline(drug, docs_hash, pubmed_ids, progress)
+
+    job_id = jobs.submit(drug, run, key=f"{drug}:{docs_hash}")
+
+    return redirect(url_for("job_progress", job_id=job_id))
+
+
+# ===================== JOBS (PROGRESS + RESULT) =====================
+# Drug pages that may wait on a first run (see first_run); ?next= names one
+NEXT_ENDPOINTS = {"results_page", "pubmed_page", "clinical_view", "exim_view", "exim_more"}
 
-    # ---------- 5. Safe summary handling ----------
-    summary = results.get("final_summary")
 
-    if not summary:
-        # Guaranteed fallback (never fails)
-        summary = {
-            "note": "Fallback summary (AI unavailable)",
-            "pubmed_articles": len(results.get("pubmed", [])),
-            "clinical_trials": len(results.get("clinical_trials", [])),
-            "patent_count": len(results.get("patents", [])),
-        }
+@app.route("/jobs/<job_id>")
+def job_progress(job_id):
+
+    job = jobs.get(job_id)
+    if job is None:
+        return "Unknown or expired job", 404
+
+    # Where to go when done: the job's own drug page, never a free-form URL
+    next_endpoint = request.args.get("next", "")
+    if next_endpoint in NEXT_ENDPOINTS:
+        next_url = url_for(next_endpoint, drug=job.drug)
+    else:
+        next_url = url_for("job_result", job_id=job_id)
+
+    return render_template(
+        "progress.html",
+        drug=job.drug,
+        job_id=job_id,
+        stages=MasterAgent.STAGES,
+        next_url=next_url
+    )
+
+
+@app.route("/jobs/<job_id>/status")
+def job_status(job_id):
+
+    # Polled by progress.html; ?since=N returns only events after the N-th
+    status = jobs.status(job_id, since=request.args.get("since", 0, type=int))
+    if status is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(status)
+
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+
+    job = jobs.get(job_id)
+    if job is None:
+        return "Unknown or expired job", 404
+    if job.status == "error":
+        return f"Analysis failed: {escape(job.error)}", 500
+    if job.status != "done":
+        return redirect(url_for("job_progress", job_id=job_id))
+
+    return render_results(job.drug, job.result)
+
+
+@app.route("/results/<drug>")
+def results_page(drug):
+
+    results = load_cached_data(drug)
+    if results is None:
+        return first_run(drug)
+
+    return render_results(drug.lower(), results)
+
+
+def render_results(drug, results):
+
+    # ---------- Safe summary handling ----------
+    # Older stored runs (legacy JSON) may lack the summary and LLM sections:
+    # rebuild the summary from the stored sources, show the LLM fallbacks
+    summary = results.get("final_summary") or agent.build_final_summary(
+        results.get("pubmed") or [],
+        results.get("clinical_trials") or [],
+        results.get("patents") or [],
+        results.get("iqvia") or {},
+        results.get("exim") or {},
+        results.get("unmet_needs") or [],
+    )
+    recommendation = results.get("ai_recommendation") or dict(RECOMMENDATION_FALLBACK)
+    decision = results.get("repurpose_decision") or dict(DECISION_FALLBACK)
+
+    internal = results.get("internal_summary") or {}
 
-    # ---------- 6. Render results ----------
     return render_template(
         "results.html",
         drug=drug,
         results=results,
         summary=summary,
-        has_internal_docs=has_internal_docs
+        recommendation=recommendation,
+        decision=decision,
+        has_internal_docs=internal.get("document_count", 0) > 0
     )
 
 
-# ===================== HELPER =====================
-def load_cached_data(drug):
-    drug = drug.lower()
-    path = f"data/{drug}/combined_summary.json"
+# ===================== HELPER (STALE-WHILE-REVALIDATE) =====================
+REVALIDATE_COOLDOWN = 300          # seconds between refresh attempts per drug
+_last_revalidate = {}
 
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
 
-    data = agent.run(drug)
+def load_cached_data(drug, source="combined"):
+    """
+    Stored payload for drug/source, served as-is even when some sources
+    are past their TTL; those are refreshed by a background job.
+    Never runs the pipeline in the request: returns None when nothing
+    is stored yet (routes then call first_run).
+    """
+    drug = drug.lower()
 
-    os.makedirs(f"data/{drug}", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+    data = store.get(drug, source)
+    if data is not None:
+        revalidate(drug)
 
     return data
 
 
+def is_stored(drug, source):
+    """load_cached_data for pages that only need to know the rows exist."""
+    drug = drug.lower()
+
+    if store.updated_at(drug, source) is None:
+        return False
+
+    revalidate(drug)
+    return True
+
+
+def revalidate(drug):
+    """Queue a background refresh of the drug's expired sources, if any."""
+    now = time.time()
+    if now - _last_revalidate.get(drug, 0) < REVALIDATE_COOLDOWN:
+        return
+    _last_revalidate[drug] = now
+
+    stale = agent.stale_sources(drug)
+    if not stale:
+        return
+
+    print(f"♻️ {drug}: refreshing expired sources in background: {', '.join(stale)}")
+    jobs.submit(
+        drug,
+        lambda progress: run_pipeline(drug, progress=progress, only=stale),
+        key=f"{drug}:refresh"
+    )
+
+
+def first_run(drug):
+    """Nothing stored yet: queue a full analysis and show its progress page."""
+    drug = drug.lower()
+
+    job_id = jobs.submit(
+        drug,
+        lambda progress: run_pipeline(drug, progress=progress),
+        key=f"{drug}:"
+    )
+
+    return redirect(url_for("job_progress", job_id=job_id, next=request.endpoint))
+
+
 # ===================== PUBMED PAGE =====================
 @app.route("/pubmed/<drug>")
 def pubmed_page(drug):
 
-    data = load_cached_data(drug)
-    pubmed_data = data.get("pubmed", [])
+    # Rows are loaded lazily from /api/<drug>/pubmed
+    if not is_stored(drug, "pubmed"):
+        return first_run(drug)
+    _, _, count = store.query_articles(drug, limit=0)
 
     return render_template(
         "pubmed.html",
         drug=drug,
-        pubmed=pubmed_data,
-        count=len(pubmed_data)
+        count=count
     )
 
 
@@ -149,30 +347,138 @@ def pubmed_page(drug):
 @app.route("/clinical/<drug>")
 def clinical_view(drug):
 
-    data = load_cached_data(drug)
-    trials = data.get("clinical_trials", [])
+    # Rows are loaded lazily from /api/<drug>/trials
+    if not is_stored(drug, "clinical_trials"):
+        return first_run(drug)
+    _, _, count = store.query_trials(drug, limit=0)
 
     return render_template(
         "clinical_trials.html",
         drug=drug,
-        trials=trials,
-        count=len(trials)
+        count=count
     )
 
 
+# ===================== JSON APIs (CURSOR PAGINATED) =====================
+API_MAX_LIMIT = 100
+
+
+def _page_args():
+    cursor = request.args.get("cursor", type=int)
+    limit = min(max(request.args.get("limit", 20, type=int), 1), API_MAX_LIMIT)
+    fields = [f for f in request.args.get("fields", "").split(",") if f]
+    return cursor, limit, fields
+
+
+def _project(records, fields):
+    if not fields:
+        return records
+    return [{k: r.get(k) for k in fields} for r in records]
+
+
+@app.route("/api/<drug>/trials")
+def api_trials(drug):
+    cursor, limit, fields = _page_args()
+
+    items, next_cursor, total = store.query_trials(
+        drug,
+        after=cursor,
+        limit=limit,
+        status=request.args.get("status"),
+        phase=request.args.get("phase"),
+        condition=request.args.get("condition"),
+        year=request.args.get("year", type=int),
+        q=request.args.get("q"),
+    )
+
+    return jsonify({
+        "drug": drug.lower(),
+        "total": total,
+        "items": _project(items, fields),
+        "next_cursor": next_cursor
+    })
+
+
+@app.route("/api/<drug>/trials/<nct_id>")
+def api_trial(drug, nct_id):
+    trial = store.trial(drug, nct_id)
+    if trial is None:
+        return jsonify({"error": "trial not found"}), 404
+    return jsonify(trial)
+
+
+@app.route("/api/<drug>/pubmed")
+def api_pubmed(drug):
+    cursor, limit, fields = _page_args()
+
+    items, next_cursor, total = store.query_articles(
+        drug,
+        after=cursor,
+        limit=limit,
+        year=request.args.get("year", type=int),
+        journal=request.args.get("journal"),
+        q=request.args.get("q"),
+    )
+
+    return jsonify({
+        "drug": drug.lower(),
+        "total": total,
+        "items": _project(items, fields),
+        "next_cursor": next_cursor
+    })
+
+
+# ===================== FULL-TEXT SEARCH =====================
+@app.route("/search")
+def search():
+    # Full-text search over every drug's abstracts and trial descriptions
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "q is required"}), 400
+
+    kind = request.args.get("kind")
+    if kind not in (None, "pubmed", "trial"):
+        return jsonify({"error": "kind must be pubmed or trial"}), 400
+
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+
+    t0 = time.perf_counter()
+    items = store.search(q, drug=request.args.get("drug"), kind=kind, limit=limit)
+    return jsonify({
+        "q": q,
+        "items": items,
+        "ms": round((time.perf_counter() - t0) * 1000, 2)
+    })
+
+
+# ===================== PORTFOLIO RANKING =====================
+@app.route("/api/ranking")
+def api_ranking():
+    # Portfolio triage across every analysed drug (see utils/ranking)
+    top = min(max(request.args.get("top", 20, type=int), 1), 500)
+    return jsonify({"features": FEATURES, "weights": WEIGHTS, "items": rank(top)})
+
+
+# ===================== CACHE METRICS =====================
+@app.route("/api/cache/stats")
+def cache_stats():
+    # Per worker process: parsed payload LRU + LLM response cache
+    return jsonify({
+        "parsed": parsed_cache.stats(),
+        "llm": llm_cache_stats()
+    })
+
+
 # ===================== PATENTS PAGE =====================
 @app.route("/patents/<drug>")
 def patents_page(drug):
 
     drug = drug.lower()
-    path = f"data/{drug}/combined_summary.json"
+    patents = load_cached_data(drug, "patents")
 
-    if not os.path.exists(path):
+    if patents is None:
         return "No patent data found", 404
 
-    data = json.load(open(path, "r", encoding="utf-8"))
-    patents = data.get("patents", [])
-
     return render_template(
         "patents.html",
         drug=drug,
@@ -184,8 +490,9 @@ def patents_page(drug):
 @app.route("/exim/<drug>")
 def exim_view(drug):
 
-    data = load_cached_data(drug)
-    exim = data.get("exim", {})
+    exim = load_cached_data(drug, "exim")
+    if exim is None:
+        return first_run(drug)
 
     return render_template(
         "exim.html",
@@ -198,8 +505,9 @@ def exim_view(drug):
 @app.route("/exim_more/<drug>")
 def exim_more(drug):
 
-    data = load_cached_data(drug)
-    exim = data.get("exim", {})
+    exim = load_cached_data(drug, "exim")
+    if exim is None:
+        return first_run(drug)
 
     return render_template(
         "exim_more.html",
@@ -209,17 +517,8 @@ def exim_more(drug):
 
 @app.route("/internal/<drug>")
 def internal_view(drug):
-    path = f"data/{drug}/internal_summary.json"
-
-    if not os.path.exists(path):
-        return render_template(
-            "internal.html",
-            drug=drug,
-            internal=None
-        )
 
-    with open(path, "r", encoding="utf-8") as f:
-        internal = json.load(f)
+    internal = store.get(drug.lower(), "internal_summary")
 
     return render_template(
         "internal.html",
@@ -0,0 +1,218 @@
+# batch.py
+"""
+Batch analysis: run MasterAgent over a whole list of drugs.
+
+Usage:
+    python batch.py drugs.txt|drugs.csv [--workers N] [--checkpoint PATH] [--force]
+
+Input is either one drug per line (blank lines and # comments ignored) or
+a CSV with a "drug" column (otherwise its first column is used).
+
+- Drugs run on a bounded thread pool in one process, so the PubMed,
+  ClinicalTrials.gov and Groq rate limiters (class/module level) are
+  shared by the whole batch: throughput is capped by the API quotas, not
+  by running one drug at a time.
+- Drugs whose stored sources are all still fresh are skipped; partly
+  stale ones only re-run their expired sources (MasterAgent.stale_sources).
+  --force re-runs everything.
+- Every finished drug is appended to a JSONL checkpoint. Re-running the
+  same command after a crash or Ctrl-C resumes where it stopped; failed
+  drugs are retried. A checkpointed drug is only skipped while none of
+  its sources has expired, so the same list run weeks later refreshes
+  what went stale.
+- A summary table is printed and written as CSV next to the checkpoint.
+"""
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from agents.master_agent import MasterAgent
+from utils.datastore import store
+
+BATCH_DIR = "data/_batch"
+WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Checkpoint statuses that count as finished on resume
+FINISHED = ("done", "refreshed", "fresh")
+
+COLUMNS = ["drug", "status", "seconds", "pubmed", "trials", "patents",
+           "decision", "recommendation", "error"]
+
+
+# --------------------------------------------------
+# INPUT
+# --------------------------------------------------
+def read_drugs(path):
+    """Drug names from a text list or CSV, lowercased, duplicates dropped."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.reader(f))
+            header = [h.strip().lower() for h in rows[0]] if rows else []
+            if "drug" in header:
+                col = header.index("drug")
+                rows = rows[1:]
+            else:
+                col = 0
+            names = [r[col] for r in rows if len(r) > col]
+        else:
+            names = [line for line in f if not line.lstrip().startswith("#")]
+
+    seen = {}
+    for name in names:
+        name = name.strip().lower()
+        if name:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+# --------------------------------------------------
+# CHECKPOINT
+# --------------------------------------------------
+class Checkpoint:
+    """Append-only JSONL of per-drug results; the last line per drug wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except ValueError:
+                        continue    # torn last line from a crash
+                    self.rows[row["drug"]] = row
+
+    def finished(self, drug):
+        row = self.rows.get(drug)
+        return row is not None and row["status"] in FINISHED
+
+    def record(self, row):
+        with self._lock:
+            self.rows[row["drug"]] = row
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+# --------------------------------------------------
+# ONE DRUG
+# --------------------------------------------------
+def _row(drug, status, combined, t0, error=""):
+    combined = combined or {}
+    return {
+        "drug": drug,
+        "status": status,
+        "seconds": round(time.monotonic() - t0, 1),
+        "pubmed": combined.get("pubmed_count", len(combined.get("pubmed") or [])),
+        "trials": len(combined.get("clinical_trials") or []),
+        "patents": len(combined.get("patents") or []),
+        "decision": (combined.get("repurpose_decision") or {}).get("decision", ""),
+        "recommendation": (combined.get("ai_recommendation") or {}).get("recommendation", ""),
+        "error": error,
+    }
+
+
+def analyze(agent, drug, force=False):
+    t0 = time.monotonic()
+    try:
+        only = None
+        if not force and store.updated_at(drug, "combined") is not None:
+            only = agent.stale_sources(drug)
+            if not only:
+                return _row(drug, "fresh", store.get(drug, "combined"), t0)
+
+        combined = agent.run(drug, only=only)
+        return _row(drug, "refreshed" if only else "done", combined, t0)
+
+    except Exception as e:
+        print(f"❌ {drug}: analysis failed:", e)
+        return _row(drug, "error", None, t0, error=str(e))
+
+
+# --------------------------------------------------
+# SUMMARY
+# --------------------------------------------------
+def write_summary(rows, path):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(rows):
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in COLUMNS[:-1]}
+    print("\n" + "  ".join(c.upper().ljust(widths[c]) for c in widths))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in widths))
+
+    counts = {}
+    for r in rows:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    print("\n" + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+
+
+# --------------------------------------------------
+# MAIN
+# --------------------------------------------------
+def run_batch(drugs, checkpoint, workers=WORKERS, force=False):
+    agent = MasterAgent()
+    todo = [
+        d for d in drugs
+        if force or not checkpoint.finished(d) or agent.stale_sources(d)
+    ]
+
+    if len(todo) < len(drugs):
+        print(f"♻️ Resuming: {len(drugs) - len(todo)} of {len(drugs)} drugs already done")
+    print(f"\n=== Batch: {len(todo)} drugs on {workers} workers ===\n")
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {pool.submit(analyze, agent, d, force): d for d in todo}
+        for n, fut in enumerate(as_completed(futures), 1):
+            row = fut.result()
+            checkpoint.record(row)
+            print(f"📄 [{n}/{len(todo)}] {row['drug']}: {row['status']} ({row['seconds']}s)")
+    except KeyboardInterrupt:
+        print("\n⏱️ Interrupted: finished drugs are checkpointed, re-run to resume")
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    return [checkpoint.rows[d] for d in drugs if d in checkpoint.rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a list of drugs in one batch.")
+    parser.add_argument("input", help="text file (one drug per line) or CSV with a 'drug' column")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="drugs analyzed at once")
+    parser.add_argument("--checkpoint", help="JSONL checkpoint (default: data/_batch/<input>.jsonl)")
+    parser.add_argument("--force", action="store_true", help="re-run fresh and already finished drugs")
+    args = parser.parse_args()
+
+    drugs = read_drugs(args.input)
+    if not drugs:
+        print("❌ No drug names in", args.input)
+        return
+
+    name = os.path.splitext(os.path.basename(args.input))[0]
+    checkpoint_path = args.checkpoint or os.path.join(BATCH_DIR, f"{name}.jsonl")
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+
+    rows = run_batch(drugs, Checkpoint(checkpoint_path), workers=args.workers, force=args.force)
+
+    summary_path = os.path.splitext(checkpoint_path)[0] + "_summary.csv"
+    write_summary(rows, summary_path)
+    print_summary(rows)
+    print("\nSummary written to", summary_path)
+
+
+if __name__ == "__main__":
+    main()
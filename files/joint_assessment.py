@@ -0,0 +1,58 @@
+from files.llm_client import chat, extract_json
+from files import recommender, repurpose_decision
+
+SYSTEM_PROMPT = """
+You are a senior pharmaceutical strategy scientist.
+
+Your job (two outputs from ONE read of the evidence):
+1. A simple, business-friendly recommendation about drug repurposing
+   with 4–6 short reasons and a 3–5 line short summary.
+2. A decision whether the drug SHOULD be repurposed (YES / NO / CONDITIONAL)
+   with 4–6 scientific and market reasons and a 4–6 sentence explanation.
+
+- Use evidence from PubMed, clinical trials, patents, unmet needs, EXIM & IQVIA if available.
+- If evidence is weak or missing → say so.
+- Only return JSON.
+
+OUTPUT FORMAT (must follow exactly):
+
+{
+  "ai_recommendation": {
+    "recommendation": "short recommendation",
+    "reasons": ["reason1", "reason2", ...],
+    "short_summary": "3-5 lines"
+  },
+  "repurpose_decision": {
+    "decision": "YES or NO or CONDITIONAL",
+    "reasons": ["reason1", "reason2", ...],
+    "explanation": "full paragraph here"
+  }
+}
+"""
+
+
+def joint_assessment(data):
+    """
+    Ask for the recommendation and the repurpose decision in a single
+    Groq call. Returns (ai_recommendation, repurpose_decision).
+    """
+    # The decision prompt is a superset of the recommendation prompt
+    prompt = repurpose_decision.build_prompt(data)
+
+    raw = chat(SYSTEM_PROMPT, prompt, temperature=0.2, max_tokens=900,
+               cache_if=extract_json)
+    parsed = extract_json(raw) or {}
+
+    rec = parsed.get("ai_recommendation")
+    dec = parsed.get("repurpose_decision")
+
+    if not isinstance(rec, dict):
+        rec = dict(recommender.FALLBACK)
+    if not isinstance(dec, dict):
+        dec = {
+            "decision": "UNCLEAR",
+            "reasons": ["Model did not return proper JSON"],
+            "explanation": raw
+        }
+
+    return rec, dec
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/_cache/llm_cache.sqlite3")
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))     # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+
+class LLMCache:
+    """
+    Content-addressed, persistent cache of LLM responses.
+
+    Keys are a SHA-256 over (model, system prompt, user prompt, temperature,
+    max_tokens). Entries live in SQLite on local disk, expire after `ttl`
+    seconds and the least recently used rows are evicted once the table
+    grows past `max_entries`.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:                      # commit / rollback
+                yield conn
+        finally:
+            conn.close()
+
+    # --------------------------------------------------
+    # KEY
+    # --------------------------------------------------
+    @staticmethod
+    def make_key(model, system_prompt, user_prompt, temperature, max_tokens):
+        blob = json.dumps(
+            [model, system_prompt, user_prompt, temperature, max_tokens],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    # --------------------------------------------------
+    # GET / PUT
+    # --------------------------------------------------
+    def get(self, key):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row and now - row[1] <= self.ttl:
+                    conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+                    self._count(hit=True)
+                    return row[0]
+
+                if row:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print("❌ LLM cache read failed:", e)
+
+        self._count(hit=False)
+        return None
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, now)
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            print("❌ LLM cache write failed:", e)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+
+        (count,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    # --------------------------------------------------
+    # METRICS
+    # --------------------------------------------------
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def stats(self):
+        try:
+            with self._connect() as conn:
+                (size,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        except sqlite3.Error:
+            size = None
+
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "entries": size,
+        }
@@ -0,0 +1,94 @@
+import os
+import re
+import json
+import threading
+
+import httpx
+from groq import Groq, DefaultHttpxClient
+from dotenv import load_dotenv
+
+from files.llm_cache import LLMCache
+from utils.rate_limit import TokenBucket
+
+load_dotenv()
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+
+# Max Groq calls in flight per process (shared by every caller)
+MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+
+# Groq requests-per-minute quota, shared by every caller in the process
+# (batch runs issue many drugs' calls at once)
+REQUESTS_PER_MINUTE = float(os.getenv("GROQ_RPM", "30"))
+
+# ---------- ONE CLIENT, ONE HTTPS POOL ----------
+client = Groq(
+    api_key=os.getenv("GROQ_API_KEY"),
+    timeout=60,
+    http_client=DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=MAX_CONCURRENCY * 2,
+            max_keepalive_connections=MAX_CONCURRENCY,
+        )
+    ),
+)
+
+_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+RATE_LIMITER = TokenBucket(rate=REQUESTS_PER_MINUTE / 60, capacity=min(REQUESTS_PER_MINUTE, 10))
+
+# Set LLM_CACHE=0 to always hit the API
+cache = LLMCache() if os.getenv("LLM_CACHE", "1") == "1" else None
+
+
+def chat(system_prompt, user_prompt, model=DEFAULT_MODEL, temperature=0.2, max_tokens=400,
+         cache_if=None):
+    """
+    Send one chat completion through the shared client and return the text.
+    Blocks while MAX_CONCURRENCY calls are already running.
+
+    Identical requests are answered from the response cache. `cache_if`
+    (e.g. extract_json) decides whether a fresh response is worth keeping.
+    """
+    key = None
+    if cache:
+        key = LLMCache.make_key(model, system_prompt, user_prompt, temperature, max_tokens)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    text = _complete(system_prompt, user_prompt, model, temperature, max_tokens)
+
+    if key and text and (cache_if is None or cache_if(text)):
+        cache.put(key, text, model=model)
+
+    return text
+
+
+def _complete(system_prompt, user_prompt, model, temperature, max_tokens):
+    RATE_LIMITER.acquire()
+    with _slots:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+
+    return response.choices[0].message.content
+
+
+def cache_stats():
+    return cache.stats() if cache else {"enabled": False}
+
+
+def extract_json(text):
+    match = re.search(r"\{[\s\S]*\}", text or "")
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except Exception:
+            pass
+    return None
@@ -1,11 +1,6 @@
-import os
 import json
-from groq import Groq
-from dotenv import load_dotenv
 
-load_dotenv()
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+from files.llm_client import chat, extract_json
 
 SYSTEM_PROMPT = """
 You are a pharmaceutical strategy assistant.
@@ -18,6 +13,12 @@ Your job:
 - Keep it simple and business-friendly.
 """
 
+FALLBACK = {
+    "recommendation": "UNCLEAR",
+    "reasons": ["AI summary failed."],
+    "short_summary": "No automated reasoning available."
+}
+
 def build_prompt(data):
     compact = {
         "drug": data.get("drug"),
@@ -34,30 +35,13 @@ def build_prompt(data):
 def ai_recommendation(data):
     prompt = build_prompt(data)
 
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=400,
-        temperature=0.2
-    )
-
-    text = response.choices[0].message.content
+    text = chat(SYSTEM_PROMPT, prompt, max_tokens=400, temperature=0.2,
+                cache_if=extract_json)
 
     # Extract JSON safely
-    import re
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except:
-            pass
+    parsed = extract_json(text)
+    if parsed:
+        return parsed
 
     # fallback
-    return {
-        "recommendation": "UNCLEAR",
-        "reasons": ["AI summary failed."],
-        "short_summary": "No automated reasoning available."
-    }
+    return dict(FALLBACK)
@@ -1,12 +1,6 @@
-import os
 import json
-import re
-from groq import Groq
-from dotenv import load_dotenv
 
-load_dotenv()
-
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+from files.llm_client import chat, extract_json
 
 SYSTEM_PROMPT = """
 You are a senior pharmaceutical strategy scientist.
@@ -28,6 +22,12 @@ OUTPUT FORMAT (must follow exactly):
 }
 """
 
+FALLBACK = {
+    "decision": "UNCLEAR",
+    "reasons": ["AI decision unavailable."],
+    "explanation": "No automated reasoning available."
+}
+
 def build_prompt(data):
     compact = {
         "drug": data.get("drug"),
@@ -42,30 +42,11 @@ def build_prompt(data):
     return json.dumps(compact, indent=2)
 
 
-def extract_json(text):
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except Exception:
-            pass
-    return None
-
-
 def repurpose_decision(data):
     prompt = build_prompt(data)
 
-    response = client.chat.completions.create(
-        model="llama-3.1-8b-instant",
-        temperature=0.2,
-        max_tokens=500,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt}
-        ]
-    )
-
-    raw = response.choices[0].message.content
+    raw = chat(SYSTEM_PROMPT, prompt, temperature=0.2, max_tokens=500,
+               cache_if=extract_json)
     parsed = extract_json(raw)
 
     if parsed:
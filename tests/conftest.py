@@ -0,0 +1,13 @@
+# tests/conftest.py
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# A throwaway datastore and no LLM cache; data/<drug> paths resolve from the repo root
+os.chdir(ROOT)
+os.environ["DATASTORE_PATH"] = os.path.join(tempfile.mkdtemp(), "store.sqlite3")
+os.environ["LLM_CACHE"] = "0"
+os.environ.setdefault("GROQ_API_KEY", "test")
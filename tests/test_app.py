@@ -0,0 +1,105 @@
+import io
+import threading
+import time
+
+import pytest
+
+import app as webapp
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No background refresh jobs from page views
+    monkeypatch.setattr(webapp, "revalidate", lambda drug: None)
+    return webapp.app.test_client()
+
+
+def test_results_page_renders_legacy_combined_summary(client):
+    # data/paracetamol/combined_summary.json predates final_summary / LLM sections
+    legacy = webapp.store.get("paracetamol", "combined")
+    assert "final_summary" not in legacy and "ai_recommendation" not in legacy
+
+    resp = client.get("/results/paracetamol")
+    assert resp.status_code == 200
+
+    html = resp.get_data(as_text=True)
+    assert "5.15B" in html                 # market size rebuilt from the stored IQVIA data
+    assert "UNCLEAR" in html               # recommendation / decision fallbacks
+
+
+def test_request_attaching_to_running_job_leaves_no_staged_uploads(client, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    started, release = threading.Event(), threading.Event()
+
+    def fake_run(drug, **kwargs):
+        started.set()
+        release.wait(5)
+        return {}
+
+    monkeypatch.setattr(webapp.agent.pubmed, "search", lambda drug: ["1"])
+    monkeypatch.setattr(webapp.agent, "run", fake_run)
+
+    def post():
+        return client.post("/analyze", data={
+            "drug": "stagingdrug",
+            "files": (io.BytesIO(b"internal report"), "report.pdf"),
+        }, content_type="multipart/form-data")
+
+    first = post()
+    assert started.wait(5)              # the owner has installed its uploads
+    second = post()
+    assert second.headers["Location"] == first.headers["Location"]
+
+    release.set()
+    job_id = first.headers["Location"].rsplit("/", 1)[-1]
+    for _ in range(100):
+        if webapp.jobs.get(job_id).finished:
+            break
+        time.sleep(0.05)
+
+    staging = tmp_path / webapp.UPLOAD_STAGING
+    assert not staging.exists() or not any(staging.iterdir())
+    assert (tmp_path / "data/stagingdrug/internal_docs/report.pdf").exists()
+
+
+def test_progress_page_only_redirects_to_the_jobs_drug_pages(client):
+    job_id = webapp.jobs.submit("nextdrug", lambda progress: {})
+
+    for evil in ("/\\evil.com", "//evil.com", "https://evil.com", "/results/otherdrug"):
+        html = client.get(f"/jobs/{job_id}", query_string={"next": evil}).get_data(as_text=True)
+        assert "evil.com" not in html and "otherdrug" not in html
+        assert f"/jobs/{job_id}/result" in html
+
+    html = client.get(f"/jobs/{job_id}", query_string={"next": "pubmed_page"}).get_data(as_text=True)
+    assert '"/pubmed/nextdrug"' in html
+
+
+def test_failed_job_does_not_echo_the_exception(client):
+    def fail(progress):
+        raise RuntimeError("<script>alert(1)</script> https://api.example/key=secret")
+
+    job_id = webapp.jobs.submit("faildrug", fail)
+    for _ in range(100):
+        if webapp.jobs.get(job_id).finished:
+            break
+        time.sleep(0.05)
+
+    resp = client.get(f"/jobs/{job_id}/result")
+    assert resp.status_code == 500
+    for body in (resp.get_data(as_text=True), client.get(f"/jobs/{job_id}/status").get_data(as_text=True)):
+        assert "secret" not in body and "<script>" not in body
+    assert webapp.jobs.ERROR_MESSAGE in resp.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("page, source, record", [
+    ("pubmed", "pubmed", {"pmid": "1", "title": "t"}),
+    ("clinical", "clinical_trials", {"nct_id": "NCT1", "title": "t"}),
+])
+def test_lazy_list_pages_embed_the_drug_as_a_js_string(client, monkeypatch, tmp_path, page, source, record):
+    monkeypatch.chdir(tmp_path)
+    drug = 'x"y<b>'
+    webapp.store.put(drug, source, [record], export=False)
+
+    html = client.get(f"/{page}/{drug}").get_data(as_text=True)
+    assert 'encodeURIComponent("x\\"y\\u003cb\\u003e")' in html
+    assert '"/api/x' not in html
@@ -0,0 +1,35 @@
+import pytest
+
+import batch
+
+
+class FakeAgent:
+    stale = {"staledrug": ["pubmed"], "freshdrug": [], "newdrug": ["pubmed", "patents"]}
+
+    def __init__(self):
+        self.runs = []
+
+    def stale_sources(self, drug):
+        return self.stale[drug]
+
+    def run(self, drug, only=None):
+        self.runs.append(drug)
+        return {"drug": drug}
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(batch, "MasterAgent", lambda: agent)
+    return agent
+
+
+def test_checkpointed_drugs_rerun_once_their_sources_expire(agent, tmp_path):
+    checkpoint = batch.Checkpoint(str(tmp_path / "drugs.jsonl"))
+    for drug in ("staledrug", "freshdrug"):
+        checkpoint.record({"drug": drug, "status": "done"})
+
+    rows = batch.run_batch(["staledrug", "freshdrug", "newdrug"], checkpoint, workers=1)
+
+    assert sorted(agent.runs) == ["newdrug", "staledrug"]
+    assert [r["drug"] for r in rows] == ["staledrug", "freshdrug", "newdrug"]
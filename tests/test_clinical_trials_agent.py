@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from agents.clinical_trials_agent import ClinicalTrialsAgent
+from utils.datastore import store
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def study(nct_id, updated):
+    return {"protocolSection": {
+        "identificationModule": {"nctId": nct_id, "officialTitle": nct_id},
+        "statusModule": {"overallStatus": "RECRUITING",
+                         "lastUpdatePostDateStruct": {"date": updated}},
+    }}
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ClinicalTrialsAgent.RATE_LIMITER, "acquire", lambda tokens=1: None)
+    return ClinicalTrialsAgent()
+
+
+def serve(agent, monkeypatch, pages):
+    def get(url, params=None, timeout=None):
+        page = int(params.get("pageToken", 0))
+        payload = {"studies": pages[page]}
+        if page + 1 < len(pages):
+            payload["nextPageToken"] = str(page + 1)
+        return FakeResponse(payload)
+
+    monkeypatch.setattr(agent.session, "get", get)
+
+
+def watermark(drug):
+    return store.get_meta(drug, "trials_watermark")["watermark"]
+
+
+def test_incremental_refresh_keeps_watermark_when_page_cap_is_hit(agent, monkeypatch):
+    drug = "capdrug"
+    store.put(drug, "clinical_trials", [agent._clean(study("NCT1", "2024-01-01"))], export=False)
+    agent._save_watermark(drug, store.get(drug, "clinical_trials"), "full")
+
+    # Three pages of updates, only two fetched
+    serve(agent, monkeypatch, [[study("NCT2", "2025-06-01")], [study("NCT3", "2024-03-01")],
+                               [study("NCT4", "2024-02-01")]])
+    merged = agent.get_trials(drug, max_pages=2)
+
+    assert {t["nct_id"] for t in merged} == {"NCT1", "NCT2", "NCT3"}
+    assert watermark(drug) == "2024-01-01"
+
+    # Everything fits: the watermark moves forward
+    serve(agent, monkeypatch, [[study("NCT4", "2024-02-01")]])
+    agent.get_trials(drug, max_pages=2)
+    assert watermark(drug) == "2025-06-01"
+
+
+def test_full_refresh_replaces_file_and_leaves_no_temp_files(agent, monkeypatch, tmp_path):
+    drug = "fulldrug"
+    serve(agent, monkeypatch, [[study("NCT1", "2024-01-01")], [study("NCT2", "2024-02-01")]])
+    trials = agent.get_trials(drug, incremental=False)
+
+    folder = tmp_path / "data" / drug
+    assert [t["nct_id"] for t in trials] == ["NCT1", "NCT2"]
+    assert [t["nct_id"] for t in json.loads((folder / "clinical_trials.json").read_text())] == ["NCT1", "NCT2"]
+    assert not list(folder.glob(".tmp-*"))
+
+    # A failed run keeps the previous file and cleans up after itself
+    def fail(*args, **kwargs):
+        raise ConnectionError("offline")
+
+    monkeypatch.setattr(agent.session, "get", fail)
+    agent.get_trials(drug, incremental=False)
+    assert len(json.loads((folder / "clinical_trials.json").read_text())) == 2
+    assert not list(folder.glob(".tmp-*"))
+
+
+def test_full_refresh_cut_by_page_cap_sets_no_watermark(agent, monkeypatch):
+    drug = "bigdrug"
+    pages = [[study("NCT1", "2025-06-01")], [study("NCT2", "2024-03-01")], [study("NCT3", "2024-02-01")]]
+    serve(agent, monkeypatch, pages)
+
+    assert len(agent.get_trials(drug, max_pages=2)) == 2
+    assert store.get_meta(drug, "trials_watermark")["mode"] == "partial"
+    assert agent._load_state(drug) == (None, None)
+
+    # Next run walks everything again instead of an incremental merge
+    assert len(agent.get_trials(drug, max_pages=5)) == 3
+    assert watermark(drug) == "2025-06-01"
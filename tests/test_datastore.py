@@ -0,0 +1,54 @@
+from utils.datastore import DataStore
+
+
+def test_legacy_folders_are_searchable_before_first_visit(tmp_path):
+    # A fresh database next to the shipped data/<drug>/*.json folders
+    store = DataStore(path=str(tmp_path / "store.sqlite3"), base_dir="data")
+
+    hits = store.search("liver", drug="paracetamol")
+    assert hits
+
+    items, _, total = store.query_trials("paracetamol", limit=5)
+    assert items and total > 0
+
+    items, _, total = store.query_articles("insulin", limit=5)
+    assert items and total > 0
+
+    assert store.term_df(["insulin"]).get("insulin", 0) > 0
+
+
+def test_legacy_import_runs_once(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    DataStore(path=path, base_dir="data")
+    assert DataStore(path=path, base_dir="data").import_legacy_folders() == 0
+
+
+def trial(nct_id, title):
+    return {"nct_id": nct_id, "title": title, "conditions": ["Pain"]}
+
+
+def index_rows(store, drug):
+    return store._conn().execute(
+        "SELECT ref, title FROM search_index WHERE drug = ? ORDER BY ref", (drug,)
+    ).fetchall()
+
+
+def test_trial_updates_replace_their_index_rows(tmp_path):
+    store = DataStore(path=str(tmp_path / "store.sqlite3"), base_dir=str(tmp_path / "data"))
+    store.put("idxdrug", "clinical_trials", [trial("NCT1", "old one"), trial("NCT2", "two")], export=False)
+    store.put("idxdrug", "clinical_trials", [trial("NCT1", "new one"), trial("NCT3", "three")], export=False)
+
+    assert index_rows(store, "idxdrug") == [("NCT1", "new one"), ("NCT3", "three")]
+    assert not store.search("old", drug="idxdrug")
+    assert store._conn().execute("SELECT COUNT(*) FROM search_refs").fetchone()[0] == 2
+
+
+def test_index_from_before_search_refs_is_mapped_on_open(tmp_path):
+    path, base = str(tmp_path / "store.sqlite3"), str(tmp_path / "data")
+    store = DataStore(path=path, base_dir=base)
+    store.put("idxdrug", "clinical_trials", [trial("NCT1", "old one")], export=False)
+    store._conn().execute("DELETE FROM search_refs")
+
+    store = DataStore(path=path, base_dir=base)
+    store.put("idxdrug", "clinical_trials", [trial("NCT1", "new one")], export=False)
+    assert index_rows(store, "idxdrug") == [("NCT1", "new one")]
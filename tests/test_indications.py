@@ -0,0 +1,37 @@
+from agents.unmet_need_agent import UnmetNeedAgent
+from utils.datastore import store
+from utils.indications import ADVERSE_EVENTS, DISEASE_TERMS, mine
+
+
+def mined(drug):
+    return mine(store.get(drug, "clinical_trials", []), store.get(drug, "pubmed", []))
+
+
+def test_vocabularies_do_not_overlap():
+    assert not set(DISEASE_TERMS) & set(ADVERSE_EVENTS)
+
+
+def test_paracetamol_hepatotoxicity_is_not_an_indication():
+    main, candidates = mined("paracetamol")
+    assert main["indication"] == "pain"
+    assert "liver injury" not in {c["indication"] for c in candidates}
+
+    report = UnmetNeedAgent().generate(
+        "paracetamol", store.get("paracetamol", "pubmed", []), store.get("paracetamol", "clinical_trials", [])
+    )
+    assert not any("liver injury" in line for line in report)
+
+
+def test_insulin_hypoglycemia_is_not_an_indication():
+    main, candidates = mined("insulin")
+    assert main["indication"] == "diabetes"
+    names = {c["indication"] for c in candidates}
+    assert "hypoglycemia" not in names
+    assert not names & set(ADVERSE_EVENTS)
+
+
+def test_adverse_event_conditions_are_not_kept_as_unknown_names():
+    trials = [{"conditions": ["Hepatotoxicity"]}, {"conditions": ["Migraine"]}] * 3
+    main, candidates = mine(trials, [])
+    assert main["indication"] == "migraine"
+    assert not any("hepatotoxicity" in c["indication"] for c in candidates)
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+import agents.internal_agent as internal_agent
+from agents.internal_agent import InternalAgent
+
+RELEVANT = (
+    "Aspirin and ibuprofen were compared in a randomized phase 2 trial. "
+    "Patients receiving either drug showed an efficacy signal for the new "
+    "indication, with adverse event rates similar to placebo. "
+)
+UNRELATED = "The facility cafeteria menu changes every Monday and Thursday morning. "
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    calls = []
+
+    def fake_chat(system_prompt, user_prompt, **kwargs):
+        calls.append(user_prompt)
+        return json.dumps({
+            "executive_points": ["p"], "key_findings": ["k"], "risks": [],
+            "opportunities": [], "repurposing_signals": [], "confidence_note": "ok",
+        })
+
+    monkeypatch.setattr(internal_agent, "chat", fake_chat)
+    return calls
+
+
+def write_dossier(tmp_path, drug, text):
+    folder = tmp_path / "data" / drug / "internal_docs"
+    folder.mkdir(parents=True)
+    (folder / "dossier.txt").write_text(text, encoding="utf-8")
+
+
+def test_document_summary_is_stored_per_drug(tmp_path, monkeypatch, llm):
+    monkeypatch.chdir(tmp_path)
+    text = "\n\n".join([RELEVANT * 7, UNRELATED * 20] * 4)
+    write_dossier(tmp_path, "aspirin", text)
+    write_dossier(tmp_path, "ibuprofen", text)
+
+    agent = InternalAgent()
+    first = agent.summarize("aspirin")
+    second = agent.summarize("ibuprofen")
+
+    assert "most relevant to aspirin" in first["confidence_note"]
+    assert "most relevant to ibuprofen" in second["confidence_note"]
+    assert "aspirin" not in second["confidence_note"]
+
+    # Same drug again: served from the stored summary
+    calls = len(llm)
+    assert agent.summarize("ibuprofen")["confidence_note"] == second["confidence_note"]
+    assert len(llm) == calls
+
+
+GENERIC = "Patients in the randomized trial reported adverse event and safety outcomes at each dose. "
+
+
+def test_passages_must_name_the_drug():
+    agent = InternalAgent()
+    text = "\n\n".join([RELEVANT * 7, GENERIC * 15] * 5)
+
+    picked, total = agent._select_passages(text, "aspirin", agent.TOKEN_BUDGET * 4)
+    assert total == 10
+    assert len(picked) == 5 and all("Aspirin" in p for p in picked)
+
+    # Generic trial vocabulary alone selects nothing for another drug
+    assert agent._select_passages(text, "heroin", agent.TOKEN_BUDGET * 4)[0] == []
+
+
+def test_weak_passages_fall_below_the_score_cutoff():
+    agent = InternalAgent()
+    weak = "Aspirin was stocked in the pharmacy. " + UNRELATED * 15
+    text = "\n\n".join([RELEVANT * 7] * 3 + [weak])
+
+    picked, total = agent._select_passages(text, "aspirin", agent.TOKEN_BUDGET * 4)
+    assert total == 4
+    assert len(picked) == 3 and weak.strip() not in picked
+
+
+def test_default_budget_fits_one_map_wave():
+    agent = InternalAgent()
+    passages = [f"Aspirin trial {i}: " + RELEVANT * 7 for i in range(200)]
+
+    picked, _ = agent._select_passages("\n\n".join(passages), "aspirin", agent.TOKEN_BUDGET * 4)
+    chunks = list(internal_agent.pack_chunks(picked, agent.CHUNK_CHARS))
+    assert 0 < len(picked) < 200
+    assert len(chunks) <= agent.MAP_CONCURRENCY
+
+    picked, _ = agent._select_passages("\n\n".join(passages), "aspirin", 6000)
+    assert 0 < len(picked) and sum(map(len, picked)) <= 6000
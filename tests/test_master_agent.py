@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from agents.master_agent import MasterAgent
+from utils.datastore import store
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = MasterAgent()
+    stubs = {
+        (agent.pubmed, "search_and_fetch"): lambda drug, ids=None: [],
+        (agent.clinical, "get_trials"): lambda drug: [],
+        (agent.patents, "search"): lambda drug: [],
+        (agent.exim, "get_trade_data"): lambda drug: {},
+        (agent.web, "search"): lambda drug: [],
+        (agent.internal, "summarize"): lambda drug: {},
+        (agent.market, "get_market_data"): lambda drug: {"size": 1},
+        (agent.unmet, "generate"): lambda drug, pm, tr: ["need"],
+        (agent.iqvia, "get_market_data"): lambda drug, pm: {},
+    }
+    for (obj, name), fn in stubs.items():
+        monkeypatch.setattr(obj, name, fn)
+    monkeypatch.setattr(agent, "run_llm_stage", lambda combined: ({}, {}, {"status": "ok", "seconds": 0}))
+    return agent
+
+
+def test_partial_refresh_does_not_reset_derived_source_age(agent):
+    drug = "derivdrug"
+    agent.run(drug)
+    assert store.get(drug, "unmet_needs") == ["need"]
+    assert store.get(drug, "market_mock") == {"size": 1}
+
+    # unmet_needs is two days old; a pubmed-only refresh rewrites combined
+    store.put(drug, "unmet_needs", ["old need"], export=False, updated_at=time.time() - 2 * MasterAgent.DAY)
+    combined = agent.run(drug, only=["pubmed"])
+
+    assert combined["unmet_needs"] == ["old need"]          # reused, not re-run
+    stale = agent.stale_sources(drug)
+    assert "unmet_needs" in stale
+    assert "market_mock" not in stale
+
+    # Refreshing it stamps it again
+    agent.run(drug, only=["unmet_needs"])
+    assert "unmet_needs" not in agent.stale_sources(drug)
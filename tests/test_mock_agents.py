@@ -0,0 +1,33 @@
+import pytest
+
+from agents.exim_agent import EXIMAgent
+from agents.iqvia_agent import IQVIAAgent
+from files import recommender, repurpose_decision
+
+RECORDS = [{"title": "Metformin in polycystic ovary syndrome", "abstract": "Ovulation and insulin resistance."}] * 3
+
+
+@pytest.fixture(autouse=True)
+def scratch_dir(tmp_path, monkeypatch):
+    # store.put also writes data/<drug>/*.json
+    monkeypatch.chdir(tmp_path)
+
+
+def analysis(drug):
+    return {
+        "drug": drug,
+        "pubmed_count": len(RECORDS),
+        "iqvia": IQVIAAgent().get_market_data(drug, RECORDS),
+        "exim": EXIMAgent().get_trade_data(drug),
+    }
+
+
+def test_mock_market_and_trade_data_are_stable_per_drug():
+    assert analysis("metformin") == analysis("metformin")
+    assert analysis("metformin")["iqvia"] != analysis("aspirin")["iqvia"]
+
+
+def test_llm_prompts_repeat_across_runs():
+    first, second = analysis("metformin"), analysis("metformin")
+    assert recommender.build_prompt(first) == recommender.build_prompt(second)
+    assert repurpose_decision.build_prompt(first) == repurpose_decision.build_prompt(second)
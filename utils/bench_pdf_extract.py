@@ -0,0 +1,70 @@
+# utils/bench_pdf_extract.py
+"""
+Benchmark: serial PyPDF2 extraction (what InternalAgent did before) vs
+the page-level process pool in utils/pdf_extract.py, over the sample
+dossier in data/heroin/internal_docs (or any folder given).
+
+Usage: python -m utils.bench_pdf_extract [folder] [repeats]
+"""
+import glob
+import os
+import sys
+import time
+
+import PyPDF2
+
+from utils import pdf_extract
+from utils.pdf_extract import extract_pdf_text, page_count
+
+
+def serial_extract(path):
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return " ".join(p.extract_text() or "" for p in reader.pages)
+
+
+def bench(fn, paths, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for p in paths:
+            fn(p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def first_page_latency(path):
+    t0 = time.perf_counter()
+    next(iter(pdf_extract.iter_pdf_pages(path)), None)
+    return time.perf_counter() - t0
+
+
+def main(folder="data/heroin/internal_docs", repeats=3):
+    paths = sorted(glob.glob(os.path.join(folder, "*.pdf")))
+    if not paths:
+        print("No PDFs found in", folder)
+        return
+
+    pages = sum(page_count(p) for p in paths)
+    print(f"Fixtures: {len(paths)} PDFs, {pages} pages "
+          f"(pool: {pdf_extract.WORKERS} workers, {pdf_extract.PAGES_PER_TASK} pages/task)")
+
+    # Same text out of both
+    for p in paths:
+        assert serial_extract(p).split() == extract_pdf_text(p).split(), p
+
+    serial = bench(serial_extract, paths, repeats)
+    pooled = bench(extract_pdf_text, paths, repeats)   # pool already warm from the check
+
+    print(f"  serial PyPDF2     : {serial * 1000:8.1f} ms")
+    print(f"  page-level pool   : {pooled * 1000:8.1f} ms  ({serial / pooled:.1f}x)")
+
+    largest = max(paths, key=page_count)
+    print(f"  first page ready  : {first_page_latency(largest) * 1000:8.1f} ms "
+          f"({os.path.basename(largest)}, streaming)")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:3]
+    main(args[0] if args else "data/heroin/internal_docs",
+         int(args[1]) if len(args) > 1 else 3)
@@ -0,0 +1,172 @@
+# utils/bench_pubmed_parse.py
+"""
+Micro-benchmark: legacy BeautifulSoup parsing of PubMed efetch/esummary XML
+vs the streaming parser in utils/pubmed_xml.py.
+
+The saved data/*/pubmed.json corpora are turned back into efetch and
+esummary XML payloads, batched like PubMedAgent.fetch, and parsed by both
+implementations.
+
+Usage: python -m utils.bench_pubmed_parse [batch_size] [repeats]
+"""
+import glob
+import json
+import sys
+import time
+from xml.sax.saxutils import escape
+
+from bs4 import BeautifulSoup
+
+from utils.pubmed_xml import iter_efetch_articles, iter_esummary_docs, LXML
+
+
+# --------------------------------------------------
+# FIXTURES
+# --------------------------------------------------
+def load_records():
+    records = []
+    for path in sorted(glob.glob("data/*/pubmed.json")):
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.load(f))
+    return records
+
+
+def to_efetch_xml(records):
+    out = ['<?xml version="1.0" ?>\n<PubmedArticleSet>']
+    for r in records:
+        parts = (r.get("date") or "").split()
+        date = "".join(
+            f"<{tag}>{escape(v)}</{tag}>" for tag, v in zip(("Year", "Month", "Day"), parts)
+        )
+        authors = "".join(
+            f"<Author><LastName>{escape(a.rsplit(' ', 1)[0])}</LastName>"
+            f"<Initials>{escape(a.rsplit(' ', 1)[-1])}</Initials></Author>"
+            for a in r.get("authors", [])
+        )
+        abstract = (
+            f"<Abstract><AbstractText>{escape(r['abstract'])}</AbstractText></Abstract>"
+            if r.get("abstract") else ""
+        )
+        out.append(
+            "<PubmedArticle><MedlineCitation>"
+            f"<PMID>{escape(r.get('pmid', ''))}</PMID>"
+            "<Article><Journal><JournalIssue>"
+            f"<PubDate>{date}</PubDate></JournalIssue>"
+            f"<ISOAbbreviation>{escape(r.get('journal') or '')}</ISOAbbreviation></Journal>"
+            f"<ArticleTitle>{escape(r.get('title') or '')}</ArticleTitle>"
+            f"{abstract}"
+            f"<AuthorList>{authors}</AuthorList>"
+            "</Article></MedlineCitation></PubmedArticle>"
+        )
+    out.append("</PubmedArticleSet>")
+    return "".join(out)
+
+
+def to_esummary_xml(records):
+    out = ['<?xml version="1.0" ?>\n<eSummaryResult>']
+    for r in records:
+        authors = "".join(
+            f'<Item Name="Author" Type="String">{escape(a)}</Item>' for a in r.get("authors", [])
+        )
+        out.append(
+            f"<DocSum><Id>{escape(r.get('pmid', ''))}</Id>"
+            f'<Item Name="PubDate" Type="Date">{escape(r.get("date") or "")}</Item>'
+            f'<Item Name="Source" Type="String">{escape(r.get("journal") or "")}</Item>'
+            f'<Item Name="AuthorList" Type="List">{authors}</Item>'
+            f'<Item Name="Title" Type="String">{escape(r.get("title") or "")}</Item>'
+            "</DocSum>"
+        )
+    out.append("</eSummaryResult>")
+    return "".join(out)
+
+
+# --------------------------------------------------
+# IMPLEMENTATIONS
+# --------------------------------------------------
+def legacy_parse(meta_xml, abs_xml):
+    """The parsing PubMedAgent.fetch did before the streaming parser."""
+    meta_soup = BeautifulSoup(meta_xml, "xml")
+    abs_soup = BeautifulSoup(abs_xml, "xml")
+
+    abstracts = {}
+    for art in abs_soup.find_all("PubmedArticle"):
+        pmid = art.PMID.text if art.PMID else None
+        abstract_node = art.find("AbstractText")
+        abstracts[pmid] = (
+            abstract_node.get_text(" ", strip=True)
+            if abstract_node else "No abstract available."
+        )
+
+    records = []
+    for doc in meta_soup.find_all("DocSum"):
+        pmid = doc.find("Id").text
+        records.append({
+            "pmid": pmid,
+            "title": doc.find("Item", {"Name": "Title"}).text,
+            "date": doc.find("Item", {"Name": "PubDate"}).text,
+            "journal": doc.find("Item", {"Name": "Source"}).text,
+            "authors": [a.text for a in doc.find_all("Item", {"Name": "Author"})],
+            "abstract": abstracts.get(pmid)
+        })
+    return records
+
+
+def streaming_parse(meta_xml, abs_xml):
+    abstracts = {a["pmid"]: a["abstract"] for a in iter_efetch_articles(abs_xml.encode("utf-8"))}
+    records = []
+    for doc in iter_esummary_docs(meta_xml.encode("utf-8")):
+        doc["abstract"] = abstracts.get(doc["pmid"])
+        records.append(doc)
+    return records
+
+
+def efetch_only_parse(abs_xml):
+    return list(iter_efetch_articles(abs_xml.encode("utf-8")))
+
+
+# --------------------------------------------------
+# BENCH
+# --------------------------------------------------
+def bench(fn, payloads, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for p in payloads:
+            fn(*p)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main(batch_size=10, repeats=5):
+    records = load_records()
+    if not records:
+        print("No data/*/pubmed.json fixtures found.")
+        return
+
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    payloads = [(to_esummary_xml(b), to_efetch_xml(b)) for b in batches]
+    size_kb = sum(len(m) + len(a) for m, a in payloads) / 1024
+
+    # Same PMIDs / titles / abstracts out of both (modulo whitespace)
+    def key(rows):
+        return [tuple(" ".join((r[k] or "").split()) for k in ("pmid", "title", "abstract"))
+                for r in rows]
+
+    for meta_xml, abs_xml in payloads[:3]:
+        assert key(legacy_parse(meta_xml, abs_xml)) == key(streaming_parse(meta_xml, abs_xml))
+
+    print(f"Fixtures: {len(records)} records, {len(batches)} batches of {batch_size}, "
+          f"{size_kb:.0f} KB XML (parser: {'lxml' if LXML else 'xml.etree'})")
+
+    legacy = bench(legacy_parse, payloads, repeats)
+    stream = bench(streaming_parse, payloads, repeats)
+    efetch = bench(efetch_only_parse, [(a,) for _, a in payloads], repeats)
+
+    print(f"  BeautifulSoup (esummary + efetch): {legacy * 1000:8.1f} ms")
+    print(f"  iterparse     (esummary + efetch): {stream * 1000:8.1f} ms  ({legacy / stream:.1f}x)")
+    print(f"  iterparse     (efetch only)      : {efetch * 1000:8.1f} ms  ({legacy / efetch:.1f}x)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,63 @@
+# utils/bm25.py
+"""
+Okapi BM25 over short passages, pure Python, no model.
+
+Used to pick the passages of an internal document that talk about the
+drug and its repurposing signals before anything is sent to the LLM.
+"""
+import math
+import re
+from collections import Counter
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were which with not no but if than then there these those into
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens, stopwords dropped, simple plural folding."""
+    tokens = []
+    for t in _TOKEN.findall((text or "").lower()):
+        if t in STOPWORDS:
+            continue
+        if len(t) > 3 and t.endswith("s") and not t.endswith("ss"):
+            t = t[:-1]
+        tokens.append(t)
+    return tokens
+
+
+class BM25:
+    def __init__(self, docs, k1=1.5, b=0.75):
+        """docs: list of token lists."""
+        self.k1 = k1
+        self.b = b
+        self.tfs = [Counter(d) for d in docs]
+        self.lengths = [len(d) for d in docs]
+        self.avgdl = (sum(self.lengths) / len(docs)) if docs else 0.0
+
+        df = Counter()
+        for tf in self.tfs:
+            df.update(tf.keys())
+        n = len(docs)
+        self.idf = {t: math.log((n - f + 0.5) / (f + 0.5) + 1) for t, f in df.items()}
+
+    def scores(self, query):
+        """Score of every doc for a token list (repeated tokens weigh more)."""
+        out = []
+        for tf, dl in zip(self.tfs, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * dl / self.avgdl) if self.avgdl else self.k1
+            s = 0.0
+            for t in query:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            out.append(s)
+        return out
+
+    def top_k(self, query, k):
+        scores = self.scores(query)
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [(i, scores[i]) for i in ranked[:k] if scores[i] > 0]
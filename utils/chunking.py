@@ -0,0 +1,64 @@
+# utils/chunking.py
+"""
+Split long document text into prompt-sized chunks on natural boundaries.
+
+Units are pages (form feeds, as written by utils/pdf_extract), then
+sections (blank lines and heading-like lines). Units are packed greedily
+into chunks of at most `max_chars`; a unit longer than that is cut at
+sentence ends, and only as a last resort mid-text.
+"""
+import re
+
+PAGE_BREAK = "\f"
+
+_HEADING = re.compile(
+    r"^\s*(?:\d+(?:\.\d+)*\.?\s+[A-Z][^\n]{2,80}|[A-Z][A-Z0-9 ,&/()-]{3,80})\s*$",
+    re.M
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_units(text):
+    """Pages → sections → paragraphs, in document order, empty ones dropped."""
+    for page in text.split(PAGE_BREAK):
+        # Start a new unit before every heading-like line
+        marked = _HEADING.sub(lambda m: "\n\n" + m.group(0), page)
+        for part in re.split(r"\n\s*\n", marked):
+            part = part.strip()
+            if part:
+                yield part
+
+
+def _split_long(unit, max_chars):
+    piece = ""
+    for sentence in _SENTENCE_END.split(unit):
+        while len(sentence) > max_chars:
+            if piece:
+                yield piece
+                piece = ""
+            yield sentence[:max_chars]
+            sentence = sentence[max_chars:]
+        if piece and len(piece) + 1 + len(sentence) > max_chars:
+            yield piece
+            piece = ""
+        piece = f"{piece} {sentence}" if piece else sentence
+    if piece:
+        yield piece
+
+
+def pack_chunks(units, max_chars):
+    """Greedily pack units (any iterable, consumed lazily) into chunks ≤ max_chars."""
+    chunk = ""
+    for unit in units:
+        pieces = _split_long(unit, max_chars) if len(unit) > max_chars else (unit,)
+        for piece in pieces:
+            if chunk and len(chunk) + 2 + len(piece) > max_chars:
+                yield chunk
+                chunk = ""
+            chunk = f"{chunk}\n\n{piece}" if chunk else piece
+    if chunk:
+        yield chunk
+
+
+def chunk_text(text, max_chars):
+    return list(pack_chunks(split_units(text), max_chars))
@@ -0,0 +1,757 @@
+# utils/datastore.py
+"""
+Single SQLite datastore for everything the agents produce.
+
+- `documents`        one row per (drug, source) for dict/list payloads
+                     (patents, iqvia, exim, web_intel, internal_summary,
+                     combined, and the derived unmet_needs / market_mock)
+                     and a freshness stamp for every source
+- `pubmed_articles`  one row per (drug, pmid); `position` orders the
+                     current result set, NULL = known but not current
+- `clinical_trials`  one row per (drug, nct_id) with filterable columns
+- `meta`             small per-drug state (watermarks, refresh stats)
+- `internal_docs`    uploaded documents by SHA-256 of their content:
+                     extracted text
+- `internal_summaries` per-document summary for one drug, by (SHA-256, drug):
+                     passages are selected for the drug being analysed
+- `internal_chunks`  map-step summaries of document chunks, by SHA-256
+- `search_index`     FTS5 full-text index (porter stemming, BM25) over
+                     PubMed titles/abstracts and trial titles, conditions
+                     and descriptions of every drug; kept in step with
+                     the record tables inside the same transaction
+- `search_refs`      (drug, kind, ref) -> search_index rowid, so a record's
+                     old index row is replaced by rowid instead of a scan
+                     over the UNINDEXED columns
+- `pubmed_terms`     corpus-wide document frequency of every unigram and
+                     bigram in stored PubMed articles (see utils/tfidf),
+                     updated with each article write
+
+The database runs in WAL mode, so gunicorn workers can read while one
+writer commits. Every put() is a single transaction, and readers see
+either the old payload or the new one, never a partial write.
+
+The legacy data/<drug>/*.json files are still written as exports for the
+offline tools (utils/view_results.py, reports). Drugs that only exist as
+JSON folders are imported on first access. Payloads and exports use
+compact JSON (orjson when installed), and exports are replaced
+atomically through a temp file + rename.
+"""
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+from utils.parsed_cache import parsed_cache
+from utils.tfidf import article_terms
+
+DB_PATH = os.getenv("DATASTORE_PATH", "data/store.sqlite3")
+
+# source -> legacy export file under data/<drug>/
+SOURCES = {
+    "pubmed": "pubmed.json",
+    "clinical_trials": "clinical_trials.json",
+    "patents": "patents.json",
+    "iqvia": "market_iqvia.json",
+    "exim": "exim_trade.json",
+    "web_intel": "web_intel.json",
+    "internal_summary": "internal_summary.json",
+    "combined": "combined_summary.json",
+}
+
+RECORD_SOURCES = ("pubmed", "clinical_trials")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    drug TEXT NOT NULL,
+    source TEXT NOT NULL,
+    payload TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (drug, source)
+);
+
+CREATE TABLE IF NOT EXISTS pubmed_articles (
+    drug TEXT NOT NULL,
+    pmid TEXT NOT NULL,
+    position INTEGER,
+    year INTEGER,
+    journal TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (drug, pmid)
+);
+CREATE INDEX IF NOT EXISTS idx_pubmed_position ON pubmed_articles(drug, position);
+CREATE INDEX IF NOT EXISTS idx_pubmed_year ON pubmed_articles(drug, year);
+CREATE INDEX IF NOT EXISTS idx_pubmed_journal ON pubmed_articles(drug, journal);
+
+CREATE TABLE IF NOT EXISTS clinical_trials (
+    drug TEXT NOT NULL,
+    nct_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT,
+    phases TEXT,
+    conditions TEXT,
+    start_year INTEGER,
+    last_update_posted TEXT,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (drug, nct_id)
+);
+CREATE INDEX IF NOT EXISTS idx_trials_position ON clinical_trials(drug, position);
+CREATE INDEX IF NOT EXISTS idx_trials_status ON clinical_trials(drug, status);
+CREATE INDEX IF NOT EXISTS idx_trials_year ON clinical_trials(drug, start_year);
+
+CREATE TABLE IF NOT EXISTS meta (
+    drug TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (drug, key)
+);
+
+CREATE TABLE IF NOT EXISTS internal_docs (
+    sha256 TEXT PRIMARY KEY,
+    filename TEXT,
+    text TEXT,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS internal_summaries (
+    sha256 TEXT NOT NULL,
+    drug TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (sha256, drug)
+);
+
+CREATE TABLE IF NOT EXISTS internal_chunks (
+    sha256 TEXT PRIMARY KEY,
+    summary TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    drug UNINDEXED,
+    kind UNINDEXED,
+    ref UNINDEXED,
+    title,
+    body,
+    tokenize = 'porter unicode61'
+);
+
+CREATE TABLE IF NOT EXISTS search_refs (
+    drug TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    fts_rowid INTEGER NOT NULL,
+    PRIMARY KEY (drug, kind, ref)
+);
+
+CREATE TABLE IF NOT EXISTS pubmed_terms (
+    term TEXT PRIMARY KEY,
+    df INTEGER NOT NULL
+);
+"""
+
+
+def _dumps(payload):
+    """Compact JSON text (no indentation, no separator padding)."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def _loads(text):
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def write_json_atomic(path, payload):
+    """
+    Write compact JSON to `path` via a temp file in the same folder and
+    os.replace, so readers see the old file or the new one, never a
+    half-written one.
+    """
+    folder = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(_dumps(payload))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _year(text):
+    match = re.search(r"(19|20)\d{2}", text or "")
+    return int(match.group(0)) if match else None
+
+
+def _tags(values):
+    # "|a|b|" so a single LIKE '%|x|%' matches one whole element
+    return "|" + "|".join(v.lower() for v in values if v) + "|" if values else None
+
+
+def _search_text(kind, record):
+    """(title, body) indexed for one PubMed article or trial."""
+    if kind == "pubmed":
+        body = [record.get("abstract")]
+    else:
+        body = list(record.get("conditions") or []) + [
+            record.get("brief_summary"), record.get("detailed_description")
+        ]
+    return record.get("title") or "", "\n".join(str(b) for b in body if b)
+
+
+def _fts_quote(q):
+    # Every word as a literal term: "covid-19" or a stray quote is not FTS5 syntax
+    return " ".join('"' + w.replace('"', '""') + '"' for w in q.split())
+
+
+class DataStore:
+
+    def __init__(self, path=DB_PATH, base_dir="data"):
+        self.path = path
+        self.base_dir = base_dir
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+        # Databases from before the search index: build it once
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM search_index LIMIT 1").fetchone() is None and (
+            conn.execute("SELECT 1 FROM pubmed_articles LIMIT 1").fetchone()
+            or conn.execute("SELECT 1 FROM clinical_trials LIMIT 1").fetchone()
+        ):
+            self.rebuild_search_index()
+        elif conn.execute("SELECT 1 FROM search_refs LIMIT 1").fetchone() is None and (
+            conn.execute("SELECT 1 FROM search_index LIMIT 1").fetchone()
+        ):
+            # Index built before search_refs existed: map its rows once
+            self._write(lambda conn: conn.execute(
+                "INSERT OR REPLACE INTO search_refs (drug, kind, ref, fts_rowid) "
+                "SELECT drug, kind, ref, rowid FROM search_index"
+            ))
+        if conn.execute("SELECT 1 FROM pubmed_terms LIMIT 1").fetchone() is None and (
+            conn.execute("SELECT 1 FROM pubmed_articles LIMIT 1").fetchone()
+        ):
+            self.rebuild_term_stats()
+
+        # Legacy JSON folders are imported up front, so search, paginated
+        # queries and the IDF table cover every drug before its first visit
+        self.import_legacy_folders()
+
+    # --------------------------------------------------
+    # CONNECTION (ONE PER THREAD)
+    # --------------------------------------------------
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn):
+        """Run fn(conn) inside one IMMEDIATE transaction."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # --------------------------------------------------
+    # WRITE
+    # --------------------------------------------------
+    def put(self, drug, source, payload, export=True, updated_at=None):
+        """Replace the stored payload for (drug, source)."""
+        drug = drug.lower()
+        updated_at = updated_at or time.time()
+
+        def write(conn):
+            if source == "pubmed":
+                self._put_articles(conn, drug, payload)
+            elif source == "clinical_trials":
+                self._put_trials(conn, drug, payload)
+
+            body = None if source in RECORD_SOURCES else _dumps(payload)
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (drug, source, payload, updated_at) VALUES (?, ?, ?, ?)",
+                (drug, source, body, updated_at)
+            )
+
+        self._write(write)
+        parsed_cache.invalidate((drug, source))
+
+        if export:
+            self._export(drug, source, payload)
+
+        return payload
+
+    def touch(self, drug, source, updated_at=None):
+        """Mark (drug, source) as checked now without rewriting its payload."""
+        updated_at = updated_at or time.time()
+        self._write(lambda conn: conn.execute(
+            "UPDATE documents SET updated_at = ? WHERE drug = ? AND source = ?",
+            (updated_at, drug.lower(), source)
+        ))
+
+    def _put_articles(self, conn, drug, records):
+        old = dict(conn.execute(
+            "SELECT pmid, payload FROM pubmed_articles WHERE drug = ?", (drug,)
+        ).fetchall())
+        rows = [(r, _dumps(r)) for r in records if r.get("pmid")]
+
+        # Articles drop out of the current set but stay known (position NULL)
+        conn.execute("UPDATE pubmed_articles SET position = NULL WHERE drug = ?", (drug,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO pubmed_articles (drug, pmid, position, year, journal, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (drug, r["pmid"], i, _year(r.get("date")), r.get("journal"), body)
+                for i, (r, body) in enumerate(rows)
+            ]
+        )
+
+        # Only new or changed articles are re-indexed
+        changed = {r["pmid"]: r for r, body in rows if old.get(r["pmid"]) != body}
+        self._index(conn, drug, "pubmed", changed)
+        self._count_terms(
+            conn,
+            added=changed.values(),
+            removed=[_loads(old[pmid]) for pmid in changed if pmid in old]
+        )
+
+    def _put_trials(self, conn, drug, trials):
+        old = dict(conn.execute(
+            "SELECT nct_id, payload FROM clinical_trials WHERE drug = ?", (drug,)
+        ).fetchall())
+        rows = [(t, _dumps(t)) for t in trials if t.get("nct_id")]
+
+        conn.execute("DELETE FROM clinical_trials WHERE drug = ?", (drug,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO clinical_trials "
+            "(drug, nct_id, position, status, phases, conditions, start_year, last_update_posted, payload) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (drug, t["nct_id"], i, t.get("status"), _tags(t.get("phases")),
+                 _tags(t.get("conditions")), _year(t.get("start_date")),
+                 t.get("last_update_posted"), body)
+                for i, (t, body) in enumerate(rows)
+            ]
+        )
+
+        changed = {t["nct_id"]: t for t, body in rows if old.get(t["nct_id"]) != body}
+        removed = set(old) - {t["nct_id"] for t, _ in rows}
+        self._index(conn, drug, "trial", changed, removed)
+
+    def _index(self, conn, drug, kind, records, removed=()):
+        """Replace the search_index rows of `records` ({ref: record}), drop `removed`."""
+        # Only refs that already have a row are deleted, by rowid
+        rowids = dict(conn.execute(
+            "SELECT ref, fts_rowid FROM search_refs WHERE drug = ? AND kind = ?", (drug, kind)
+        ).fetchall())
+        stale = [ref for ref in list(records) + list(removed) if ref in rowids]
+        if stale:
+            conn.executemany("DELETE FROM search_index WHERE rowid = ?", [(rowids[ref],) for ref in stale])
+            conn.executemany(
+                "DELETE FROM search_refs WHERE drug = ? AND kind = ? AND ref = ?",
+                [(drug, kind, ref) for ref in stale]
+            )
+
+        refs = []
+        for ref, r in records.items():
+            cur = conn.execute(
+                "INSERT INTO search_index (drug, kind, ref, title, body) VALUES (?, ?, ?, ?, ?)",
+                (drug, kind, ref) + _search_text(kind, r)
+            )
+            refs.append((drug, kind, ref, cur.lastrowid))
+        conn.executemany(
+            "INSERT INTO search_refs (drug, kind, ref, fts_rowid) VALUES (?, ?, ?, ?)", refs
+        )
+
+    def _count_terms(self, conn, added=(), removed=()):
+        """Apply the document-frequency change of added/removed articles."""
+        delta = {}
+        for sign, records in ((1, added), (-1, removed)):
+            for r in records:
+                for term in set(article_terms(r)):
+                    delta[term] = delta.get(term, 0) + sign
+
+        conn.executemany(
+            "INSERT INTO pubmed_terms (term, df) VALUES (?, ?) "
+            "ON CONFLICT(term) DO UPDATE SET df = df + excluded.df",
+            [(t, d) for t, d in delta.items() if d]
+        )
+        if any(d < 0 for d in delta.values()):
+            conn.execute("DELETE FROM pubmed_terms WHERE df <= 0")
+
+    def rebuild_term_stats(self):
+        """Recount pubmed_terms from every stored article."""
+        def write(conn):
+            conn.execute("DELETE FROM pubmed_terms")
+            rows = conn.execute("SELECT payload FROM pubmed_articles").fetchall()
+            self._count_terms(conn, added=(_loads(r[0]) for r in rows))
+
+        self._write(write)
+        print("🔎 PubMed term statistics rebuilt")
+
+    def rebuild_search_index(self):
+        """Re-index every stored article and trial from scratch."""
+        def write(conn):
+            conn.execute("DELETE FROM search_index")
+            conn.execute("DELETE FROM search_refs")
+            for kind, table, key in (("pubmed", "pubmed_articles", "pmid"),
+                                     ("trial", "clinical_trials", "nct_id")):
+                by_drug = {}
+                for drug, ref, body in conn.execute(f"SELECT drug, {key}, payload FROM {table}"):
+                    by_drug.setdefault(drug, {})[ref] = _loads(body)
+                for drug, records in by_drug.items():
+                    self._index(conn, drug, kind, records)
+
+        self._write(write)
+        print("🔎 Search index rebuilt")
+
+    def _export(self, drug, source, payload):
+        folder = os.path.join(self.base_dir, drug)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, SOURCES[source])
+        write_json_atomic(path, payload)
+        parsed_cache.invalidate(path)
+
+    # --------------------------------------------------
+    # READ
+    # --------------------------------------------------
+    def get(self, drug, source, default=None):
+        """
+        Stored payload for (drug, source), importing legacy JSON on first access.
+
+        Parsed payloads are kept in the per-process parsed_cache and reused
+        while the row's updated_at is unchanged, so a page view costs one
+        indexed lookup instead of a json parse of the whole document.
+        """
+        drug = drug.lower()
+        stamp = self._stamp(drug, source)
+
+        if stamp is None:
+            if not self._import_legacy(drug, source):
+                return default
+            stamp = self._stamp(drug, source)
+
+        value = parsed_cache.get((drug, source), stamp, lambda: self._load(drug, source))
+        return default if value is None else value
+
+    def _load(self, drug, source):
+        if source == "pubmed":
+            return self.articles(drug)
+        if source == "clinical_trials":
+            return self.trials(drug)
+        row = self._document_row(drug, source)
+        return _loads(row[0]) if row and row[0] is not None else None
+
+    def _stamp(self, drug, source):
+        row = self._conn().execute(
+            "SELECT updated_at FROM documents WHERE drug = ? AND source = ?",
+            (drug, source)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _document_row(self, drug, source):
+        return self._conn().execute(
+            "SELECT payload, updated_at FROM documents WHERE drug = ? AND source = ?",
+            (drug, source)
+        ).fetchone()
+
+    def updated_at(self, drug, source):
+        """Unix time of the last write for (drug, source), or None."""
+        stamp = self._stamp(drug.lower(), source)
+        if stamp is None and self._import_legacy(drug.lower(), source):
+            stamp = self._stamp(drug.lower(), source)
+        return stamp
+
+    def articles(self, drug):
+        """Current PubMed result set, in relevance order."""
+        rows = self._conn().execute(
+            "SELECT payload FROM pubmed_articles WHERE drug = ? AND position IS NOT NULL "
+            "ORDER BY position",
+            (drug.lower(),)
+        ).fetchall()
+        return [_loads(r[0]) for r in rows]
+
+    def all_articles(self, drug):
+        """Every PMID ever stored for the drug -> record (current or not)."""
+        drug = drug.lower()
+        if self._document_row(drug, "pubmed") is None:
+            self._import_legacy(drug, "pubmed")
+
+        rows = self._conn().execute(
+            "SELECT pmid, payload FROM pubmed_articles WHERE drug = ?", (drug,)
+        ).fetchall()
+        return {pmid: _loads(payload) for pmid, payload in rows}
+
+    def trials(self, drug):
+        rows = self._conn().execute(
+            "SELECT payload FROM clinical_trials WHERE drug = ? ORDER BY position",
+            (drug.lower(),)
+        ).fetchall()
+        return [_loads(r[0]) for r in rows]
+
+    def drugs(self):
+        rows = self._conn().execute("SELECT DISTINCT drug FROM documents ORDER BY drug").fetchall()
+        return [r[0] for r in rows]
+
+    def stamps(self, source):
+        """{drug: updated_at} for every drug with a stored `source` row."""
+        rows = self._conn().execute(
+            "SELECT drug, updated_at FROM documents WHERE source = ? ORDER BY drug",
+            (source,)
+        ).fetchall()
+        return dict(rows)
+
+    # --------------------------------------------------
+    # PAGINATED, FILTERED QUERIES (KEYSET ON position)
+    # --------------------------------------------------
+    def _page(self, table, drug, where, args, after, limit):
+        clauses = ["drug = ?", "position IS NOT NULL"] + where
+        args = [drug] + args
+
+        total = self._conn().execute(
+            f"SELECT COUNT(*) FROM {table} WHERE {' AND '.join(clauses)}", args
+        ).fetchone()[0]
+
+        if after is not None:
+            clauses.append("position > ?")
+            args.append(after)
+
+        rows = self._conn().execute(
+            f"SELECT position, payload FROM {table} WHERE {' AND '.join(clauses)} "
+            f"ORDER BY position LIMIT ?",
+            args + [limit + 1]
+        ).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = rows[-1][0] if more and rows else None
+
+        return [_loads(r[1]) for r in rows], next_cursor, total
+
+    def query_trials(self, drug, after=None, limit=25, status=None, phase=None,
+                     condition=None, year=None, q=None):
+        """One page of trials -> (records, next_cursor, total_matching)."""
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status.upper())
+        if phase:
+            where.append("phases LIKE ?")
+            args.append(f"%|{phase.lower()}|%")
+        if condition:
+            where.append("conditions LIKE ?")
+            args.append(f"%{condition.lower()}%")
+        if year:
+            where.append("start_year = ?")
+            args.append(int(year))
+        if q:
+            where.append("payload LIKE ?")
+            args.append(f"%{q}%")
+
+        return self._page("clinical_trials", drug.lower(), where, args, after, limit)
+
+    def query_articles(self, drug, after=None, limit=25, year=None, journal=None, q=None):
+        """One page of the current PubMed set -> (records, next_cursor, total_matching)."""
+        where, args = [], []
+        if year:
+            where.append("year = ?")
+            args.append(int(year))
+        if journal:
+            where.append("journal LIKE ?")
+            args.append(f"%{journal}%")
+        if q:
+            where.append("payload LIKE ?")
+            args.append(f"%{q}%")
+
+        return self._page("pubmed_articles", drug.lower(), where, args, after, limit)
+
+    # --------------------------------------------------
+    # FULL-TEXT SEARCH (FTS5, BM25)
+    # --------------------------------------------------
+    def search(self, q, drug=None, kind=None, limit=20):
+        """
+        Best matches for q across every drug -> [{drug, kind, id, title, snippet, score}].
+
+        q is FTS5 query syntax: words are ANDed, "quoted phrases",
+        OR / NOT, prefix*, and field filters (title: ..., body: ...).
+        Text that is not valid syntax is searched word by word instead.
+        Titles weigh twice the body; PubMed articles no longer in their
+        drug's current set are left out.
+        """
+        where = ["search_index MATCH ?",
+                 "(s.kind != 'pubmed' OR EXISTS (SELECT 1 FROM pubmed_articles a "
+                 "WHERE a.drug = s.drug AND a.pmid = s.ref AND a.position IS NOT NULL))"]
+        args = []
+        if drug:
+            where.append("s.drug = ?")
+            args.append(drug.lower())
+        if kind:
+            where.append("s.kind = ?")
+            args.append(kind)
+
+        sql = (
+            "SELECT s.drug, s.kind, s.ref, s.title, "
+            "snippet(search_index, -1, '**', '**', '…', 24), "
+            "bm25(search_index, 0, 0, 0, 2.0, 1.0) AS score "
+            f"FROM search_index s WHERE {' AND '.join(where)} ORDER BY score LIMIT ?"
+        )
+
+        try:
+            rows = self._conn().execute(sql, [q] + args + [limit]).fetchall()
+        except sqlite3.OperationalError:
+            rows = self._conn().execute(sql, [_fts_quote(q)] + args + [limit]).fetchall()
+
+        return [
+            {"drug": d, "kind": k, "id": ref, "title": title, "snippet": snippet,
+             "score": round(-score, 3)}
+            for d, k, ref, title, snippet, score in rows
+        ]
+
+    # --------------------------------------------------
+    # CORPUS TERM STATISTICS (TF-IDF)
+    # --------------------------------------------------
+    def term_corpus_size(self):
+        """Number of stored PubMed articles behind pubmed_terms."""
+        return self._conn().execute("SELECT COUNT(*) FROM pubmed_articles").fetchone()[0]
+
+    def term_df(self, terms):
+        """{term: document frequency} for the given terms (missing = never seen)."""
+        out = {}
+        terms = list(terms)
+        for i in range(0, len(terms), 500):
+            batch = terms[i:i + 500]
+            out.update(self._conn().execute(
+                f"SELECT term, df FROM pubmed_terms WHERE term IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall())
+        return out
+
+    def trial(self, drug, nct_id):
+        row = self._conn().execute(
+            "SELECT payload FROM clinical_trials WHERE drug = ? AND nct_id = ?",
+            (drug.lower(), nct_id)
+        ).fetchone()
+        return _loads(row[0]) if row else None
+
+    # --------------------------------------------------
+    # META
+    # --------------------------------------------------
+    def get_meta(self, drug, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM meta WHERE drug = ? AND key = ?", (drug.lower(), key)
+        ).fetchone()
+        return _loads(row[0]) if row else default
+
+    def set_meta(self, drug, key, value):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO meta (drug, key, value) VALUES (?, ?, ?)",
+            (drug.lower(), key, json.dumps(value))
+        ))
+
+    # --------------------------------------------------
+    # INTERNAL DOCUMENTS (CONTENT ADDRESSED)
+    # --------------------------------------------------
+    def internal_doc(self, sha256):
+        """{"sha256", "filename", "text"} for a document, or None."""
+        row = self._conn().execute(
+            "SELECT filename, text FROM internal_docs WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"sha256": sha256, "filename": row[0], "text": row[1]}
+
+    def put_internal_doc(self, sha256, filename, text=None):
+        """Insert or update a document; text passed as None keeps the stored value."""
+        self._write(lambda conn: conn.execute(
+            "INSERT INTO internal_docs (sha256, filename, text, updated_at) "
+            "VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(sha256) DO UPDATE SET filename = excluded.filename, "
+            "text = COALESCE(excluded.text, text), "
+            "updated_at = excluded.updated_at",
+            (sha256, filename, text, time.time())
+        ))
+
+    def doc_summary(self, sha256, drug):
+        row = self._conn().execute(
+            "SELECT summary FROM internal_summaries WHERE sha256 = ? AND drug = ?",
+            (sha256, drug.strip().lower())
+        ).fetchone()
+        return _loads(row[0]) if row else None
+
+    def put_doc_summary(self, sha256, drug, summary):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO internal_summaries (sha256, drug, summary, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (sha256, drug.strip().lower(), _dumps(summary), time.time())
+        ))
+
+    def chunk_summary(self, sha256):
+        row = self._conn().execute(
+            "SELECT summary FROM internal_chunks WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        return _loads(row[0]) if row else None
+
+    def put_chunk_summary(self, sha256, summary):
+        self._write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO internal_chunks (sha256, summary, updated_at) VALUES (?, ?, ?)",
+            (sha256, _dumps(summary), time.time())
+        ))
+
+    # --------------------------------------------------
+    # LEGACY JSON IMPORT
+    # --------------------------------------------------
+    def import_legacy_folders(self):
+        """Import every data/<drug>/*.json that has no row yet; returns the count."""
+        if not os.path.isdir(self.base_dir):
+            return 0
+
+        imported = 0
+        for name in sorted(os.listdir(self.base_dir)):
+            # data/_cache, data/_uploads, ... are not drugs
+            if name.startswith("_") or not os.path.isdir(os.path.join(self.base_dir, name)):
+                continue
+            for source in SOURCES:
+                if self._stamp(name, source) is None and self._import_legacy(name, source):
+                    imported += 1
+
+        if imported:
+            print(f"📄 Imported {imported} legacy JSON file(s) into the datastore")
+        return imported
+
+    def _import_legacy(self, drug, source):
+        path = os.path.join(self.base_dir, drug, SOURCES.get(source, ""))
+        if source not in SOURCES or not os.path.isfile(path):
+            return False
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except Exception as e:
+            print(f"❌ Could not import {path}:", e)
+            return False
+
+        # Keep the file's age so freshness checks see how old it really is
+        self.put(drug, source, payload, export=False, updated_at=os.path.getmtime(path))
+        return True
+
+
+store = DataStore()
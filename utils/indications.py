@@ -0,0 +1,263 @@
+# utils/indications.py
+"""
+Deterministic indication mining: which diseases does the evidence for a
+drug mention, and which are under-explored next to its main use?
+
+- Trial `conditions` are aggregated directly (each trial counts once per
+  indication); a condition that contains a known disease is mapped to it,
+  any other condition is kept under its own normalized name.
+- PubMed titles and abstracts are scanned with a word-level trie built
+  from DISEASE_TERMS plus every trial condition seen, longest match
+  first. Each article counts once per indication.
+- ADVERSE_EVENTS (hepatotoxicity, hypoglycemia, ...) are matched too but
+  never ranked: they describe the drug's safety, not new uses.
+
+Both passes touch every token a bounded number of times (phrases are at
+most a few words), so mining is linear in the size of the corpus.
+"""
+import math
+
+from utils.bm25 import tokenize
+
+# canonical indication -> synonyms (the canonical name is matched too)
+DISEASE_TERMS = {
+    "pain": ["analgesia", "chronic pain", "acute pain", "neuropathic pain"],
+    "postoperative pain": ["post operative pain", "post-operative pain", "postsurgical pain"],
+    "fever": ["pyrexia", "febrile"],
+    "headache": ["tension headache", "tension-type headache"],
+    "migraine": [],
+    "osteoarthritis": [],
+    "rheumatoid arthritis": [],
+    "inflammation": ["inflammatory disease"],
+    "gout": [],
+    "lupus": ["systemic lupus erythematosus"],
+    "psoriasis": [],
+    "atopic dermatitis": ["eczema"],
+    "asthma": [],
+    "copd": ["chronic obstructive pulmonary disease"],
+    "pulmonary fibrosis": ["idiopathic pulmonary fibrosis"],
+    "pneumonia": [],
+    "covid-19": ["covid", "sars-cov-2", "coronavirus disease"],
+    "influenza": ["flu"],
+    "sepsis": ["septic shock"],
+    "tuberculosis": [],
+    "malaria": [],
+    "hiv": ["hiv infection"],
+    "hepatitis": ["hepatitis b", "hepatitis c"],
+    "bacterial infection": ["infection"],
+    "type 1 diabetes": ["type 1 diabetes mellitus", "t1d"],
+    "type 2 diabetes": ["type 2 diabetes mellitus", "t2d", "t2dm"],
+    "diabetes": ["diabetes mellitus", "diabetic"],
+    "obesity": ["overweight"],
+    "insulin resistance": [],
+    "hyperglycemia": [],
+    "metabolic syndrome": [],
+    "dyslipidemia": ["hyperlipidemia", "hypercholesterolemia"],
+    "nafld": ["non-alcoholic fatty liver disease", "fatty liver", "nash", "steatohepatitis"],
+    "hypertension": ["high blood pressure"],
+    "heart failure": ["cardiac failure"],
+    "atrial fibrillation": [],
+    "coronary artery disease": ["coronary heart disease", "ischemic heart disease"],
+    "myocardial infarction": ["heart attack"],
+    "stroke": ["cerebrovascular accident"],
+    "thrombosis": ["venous thromboembolism", "deep vein thrombosis", "pulmonary embolism"],
+    "patent ductus arteriosus": ["pda"],
+    "anemia": [],
+    "chronic kidney disease": ["ckd", "renal insufficiency", "kidney disease"],
+    "acute kidney injury": ["aki", "renal failure"],
+    "kidney transplant": ["renal transplant", "kidney transplantation"],
+    "cirrhosis": ["liver cirrhosis"],
+    "inflammatory bowel disease": ["ibd", "crohn disease", "crohn's disease", "ulcerative colitis"],
+    "irritable bowel syndrome": ["ibs"],
+    "gastroesophageal reflux": ["gerd", "reflux"],
+    "pancreatitis": [],
+    "cancer": ["tumor", "tumour", "neoplasm", "malignancy", "carcinoma"],
+    "breast cancer": ["breast carcinoma"],
+    "lung cancer": ["non-small cell lung cancer", "nsclc", "small cell lung cancer"],
+    "colorectal cancer": ["colon cancer", "rectal cancer"],
+    "prostate cancer": [],
+    "pancreatic cancer": [],
+    "liver cancer": ["hepatocellular carcinoma"],
+    "ovarian cancer": [],
+    "glioblastoma": ["glioma", "brain tumor"],
+    "leukemia": ["acute myeloid leukemia", "chronic lymphocytic leukemia"],
+    "lymphoma": [],
+    "melanoma": [],
+    "multiple myeloma": ["myeloma"],
+    "alzheimer disease": ["alzheimer's disease", "alzheimer", "dementia"],
+    "parkinson disease": ["parkinson's disease", "parkinson"],
+    "multiple sclerosis": [],
+    "epilepsy": ["seizure", "seizures"],
+    "neuropathy": ["peripheral neuropathy", "diabetic neuropathy"],
+    "depression": ["major depressive disorder", "depressive disorder"],
+    "anxiety": ["anxiety disorder"],
+    "schizophrenia": [],
+    "bipolar disorder": [],
+    "adhd": ["attention deficit hyperactivity disorder"],
+    "autism": ["autism spectrum disorder"],
+    "insomnia": ["sleep disorder"],
+    "opioid use disorder": ["opioid dependence", "opioid addiction"],
+    "alcohol use disorder": ["alcohol dependence", "alcoholism"],
+    "substance use disorder": ["drug addiction", "addiction"],
+    "osteoporosis": [],
+    "fracture": ["hip fracture"],
+    "burns": ["burn injury"],
+    "wound healing": ["wound", "diabetic foot ulcer", "pressure ulcer"],
+    "polycystic ovary syndrome": ["pcos"],
+    "preeclampsia": ["pre-eclampsia"],
+    "preterm birth": ["preterm labor", "prematurity"],
+    "endometriosis": [],
+    "infertility": [],
+    "cystic fibrosis": [],
+    "sickle cell disease": ["sickle cell anemia"],
+    "hemophilia": [],
+    "glaucoma": [],
+    "macular degeneration": ["age-related macular degeneration", "amd"],
+    "diabetic retinopathy": ["retinopathy"],
+    "otitis media": ["ear infection"],
+    "sinusitis": [],
+    "dental pain": ["toothache", "tooth extraction", "third molar"],
+}
+
+# Adverse events / safety findings: matched so they are not mistaken for
+# other terms, but never ranked as indications (a drug's toxicity is not
+# a repurposing opportunity)
+ADVERSE_EVENTS = {
+    "liver injury": ["hepatotoxicity", "drug-induced liver injury", "acute liver failure",
+                     "liver failure", "liver damage"],
+    "hypoglycemia": ["hypoglycaemia", "low blood sugar"],
+    "nausea": ["vomiting", "postoperative nausea"],
+    "overdose": ["poisoning", "intoxication"],
+    "peptic ulcer": ["ulcer", "gastric ulcer", "gastrointestinal bleeding", "gi bleeding"],
+    "bleeding": ["hemorrhage", "haemorrhage"],
+    "allergic reaction": ["anaphylaxis", "hypersensitivity", "rash"],
+    "adverse drug reaction": ["adverse event", "adverse effect", "side effect", "toxicity"],
+}
+
+# Trial conditions that say nothing about an indication
+GENERIC_CONDITIONS = frozenset({
+    "healthy", "healthy volunteer", "healthy volunteers", "healthy subjects",
+    "healthy participants", "healthy adults", "healthy children",
+})
+
+MAX_PHRASE_WORDS = 6
+
+
+# --------------------------------------------------
+# TRIE (WORD LEVEL)
+# --------------------------------------------------
+class IndicationTrie:
+    """Longest-match dictionary matcher over token sequences."""
+
+    _END = object()
+
+    def __init__(self, *vocabularies):
+        self.root = {}
+        for terms in vocabularies or (DISEASE_TERMS, ADVERSE_EVENTS):
+            for canonical, synonyms in terms.items():
+                self.add(canonical, canonical)
+                for s in synonyms:
+                    self.add(s, canonical)
+
+    def add(self, phrase, canonical):
+        tokens = tokenize(phrase)
+        if not tokens or len(tokens) > MAX_PHRASE_WORDS:
+            return
+        node = self.root
+        for t in tokens:
+            node = node.setdefault(t, {})
+        node.setdefault(self._END, canonical)
+
+    def find(self, tokens):
+        """Canonical indications in a token list, longest match at each position."""
+        found = []
+        i, n = 0, len(tokens)
+        while i < n:
+            node, match, end = self.root, None, i
+            j = i
+            while j < n and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if self._END in node:
+                    match, end = node[self._END], j
+            if match:
+                found.append(match)
+                i = end
+            else:
+                i += 1
+        return found
+
+
+# --------------------------------------------------
+# MINING
+# --------------------------------------------------
+def _normalize_condition(condition):
+    return " ".join(str(condition).lower().replace(",", " ").split())
+
+
+def mine(trials, articles, terms=None, adverse_events=None, min_support=2, max_share=0.5, top=8):
+    """
+    Rank indications that are under-represented next to the main one.
+
+    Returns (main, candidates): main = {"indication", "trials", "articles",
+    "support"} for the best supported indication, candidates = the same
+    plus "share" (support / main support) and "score", best first.
+    support = 2 x trials + articles; score = log(1 + support) x (1 - share),
+    so indications with real evidence but little of it win. Adverse
+    events are recognised but left out of both main and candidates.
+    """
+    adverse_events = ADVERSE_EVENTS if adverse_events is None else adverse_events
+    trie = IndicationTrie(terms or DISEASE_TERMS, adverse_events)
+    trial_counts, article_counts = {}, {}
+
+    # ---------- Trial conditions ----------
+    conditions_per_trial = []
+    for t in trials or []:
+        names = set()
+        for c in t.get("conditions") or []:
+            c = _normalize_condition(c)
+            if not c or c in GENERIC_CONDITIONS:
+                continue
+            known = trie.find(tokenize(c))
+            names.update(known or [c])
+        conditions_per_trial.append(names)
+
+    # Unknown conditions become dictionary terms for the abstracts too
+    for names in conditions_per_trial:
+        for name in names:
+            trial_counts[name] = trial_counts.get(name, 0) + 1
+            trie.add(name, name)
+
+    # ---------- PubMed titles + abstracts ----------
+    for a in articles or []:
+        text = f"{a.get('title') or ''} {a.get('abstract') or ''}"
+        for name in set(trie.find(tokenize(text))):
+            article_counts[name] = article_counts.get(name, 0) + 1
+
+    # ---------- Rank ----------
+    rows = []
+    for name in set(trial_counts) | set(article_counts):
+        if name in adverse_events:
+            continue
+        tc, ac = trial_counts.get(name, 0), article_counts.get(name, 0)
+        rows.append({"indication": name, "trials": tc, "articles": ac, "support": 2 * tc + ac})
+
+    if not rows:
+        return None, []
+
+    rows.sort(key=lambda r: (-r["support"], r["indication"]))
+    main = rows[0]
+
+    candidates = []
+    for r in rows[1:]:
+        share = r["support"] / main["support"]
+        if r["support"] < min_support or share > max_share:
+            continue
+        candidates.append({
+            **r,
+            "share": round(share, 3),
+            "score": round(math.log1p(r["support"]) * (1 - share), 3),
+        })
+
+    candidates.sort(key=lambda r: (-r["score"], r["indication"]))
+    return main, candidates[:top]
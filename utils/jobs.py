@@ -0,0 +1,126 @@
+# utils/jobs.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    def __init__(self, job_id, drug, key=None):
+        self.id = job_id
+        self.drug = drug
+        self.key = key
+        self.status = "queued"           # queued | running | done | error
+        self.events = []                 # [{"stage", "status", "seconds"}] in finish order
+        self.result = None
+        self.error = None                # public message; the exception itself is only logged
+        self.created = time.time()
+        self.finished = None
+
+    def snapshot(self, since=0):
+        return {
+            "job_id": self.id,
+            "drug": self.drug,
+            "status": self.status,
+            "events": self.events[since:],
+            "next": len(self.events),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    In-process job queue for long analyses.
+
+    submit() returns a job ID at once; the work runs on a small thread pool
+    and reports progress through the `progress(stage, timing)` callback it
+    receives. Jobs live in this process only, so run the web app as one
+    process with threads (e.g. gunicorn --workers 1 --threads N) or pin a
+    client to the process that accepted its job. Finished jobs are dropped
+    after JOB_TTL seconds.
+    """
+
+    MAX_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+    ERROR_MESSAGE = "The analysis could not be completed. Please try again later."
+
+    def __init__(self, max_workers=None):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or self.MAX_WORKERS,
+            thread_name_prefix="job"
+        )
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    # --------------------------------------------------
+    # SUBMIT
+    # --------------------------------------------------
+    def submit(self, drug, fn, key=None):
+        """
+        fn(progress) -> result; progress(stage, timing) may be called from any thread.
+
+        With a `key`, a submit while another job with that key is still
+        queued or running returns the existing job's ID instead.
+        """
+        self._prune()
+
+        with self.lock:
+            if key is not None:
+                for job in self.jobs.values():
+                    if job.key == key and job.finished is None:
+                        print(f"🔗 Attaching to running job {job.id} ({key})")
+                        return job.id
+
+            job = Job(uuid.uuid4().hex, drug, key)
+            self.jobs[job.id] = job
+
+        self.pool.submit(self._run, job, fn)
+        return job.id
+
+    def _run(self, job, fn):
+        job.status = "running"
+
+        def progress(stage, timing):
+            with self.lock:
+                job.events.append({
+                    "stage": stage,
+                    "status": timing.get("status"),
+                    "seconds": timing.get("seconds"),
+                })
+
+        try:
+            job.result = fn(progress)
+            job.status = "done"
+        except Exception as e:
+            # Exception text can carry upstream response bodies or URLs:
+            # it goes to the server log, clients get ERROR_MESSAGE
+            print(f"❌ Job {job.id} ({job.drug}) failed:", repr(e))
+            job.error = self.ERROR_MESSAGE
+            job.status = "error"
+        finally:
+            with self.lock:
+                job.finished = time.time()
+
+    # --------------------------------------------------
+    # QUERY
+    # --------------------------------------------------
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id, since=0):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.snapshot(since) if job else None
+
+    def _prune(self):
+        cutoff = time.time() - self.JOB_TTL
+        with self.lock:
+            for job_id in [j.id for j in self.jobs.values()
+                           if j.finished and j.finished < cutoff]:
+                del self.jobs[job_id]
+
+
+# Shared queue for the web app
+jobs = JobManager()
@@ -0,0 +1,83 @@
+# utils/parsed_cache.py
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ParsedCache:
+    """
+    Bounded in-process LRU of parsed payloads (one per worker process).
+
+    Each entry carries a validity stamp — (mtime_ns, size) for a file,
+    updated_at for a datastore row. A lookup with a different stamp is a
+    miss and re-parses, so writes from other processes are picked up;
+    in-process writers can also drop an entry with invalidate().
+
+    Cached objects are shared between requests: treat them as read-only.
+    """
+
+    MAX_ENTRIES = int(os.getenv("PARSED_CACHE_MAX_ENTRIES", "128"))
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self._entries = OrderedDict()    # key -> (stamp, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, stamp, load):
+        """Cached value for key if its stamp still matches, else load() and keep it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load()
+
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def load_json(self, path, default=None):
+        """json.load(path), re-parsed only when the file's mtime or size changes."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(path)
+            return default
+
+        def load():
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+
+        return self.get(path, (st.st_mtime_ns, st.st_size), load)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+# Shared per-process cache
+parsed_cache = ParsedCache()
@@ -0,0 +1,147 @@
+# utils/pdf_extract.py
+"""
+Page-level PDF text extraction on a process pool.
+
+A document is split into page ranges, each range is extracted by a worker
+process (PyPDF2 is pure Python, so threads would serialize on the GIL),
+and iter_pdf_pages() yields page texts in page order as soon as the
+ranges covering them are done — callers can start on the first pages
+while later ones are still being extracted. InternalAgent itself uses
+extract_pdf_text(), which waits for every page: it stores whole documents
+and ranks passages across all of them.
+
+Every document has a page budget and a wall-clock timeout; whatever was
+extracted before either limit is hit is still returned.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from utils.chunking import PAGE_BREAK
+
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+PAGE_BUDGET = int(os.getenv("PDF_PAGE_BUDGET", "300"))        # pages per document
+DOC_TIMEOUT = float(os.getenv("PDF_DOC_TIMEOUT", "60"))       # seconds per document
+WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PAGES_PER_TASK = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # spawn, not fork: the web app forks from a threaded process
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+# --------------------------------------------------
+# WORKER
+# --------------------------------------------------
+def _extract_range(path, start, stop):
+    with open(path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        out = []
+        for i in range(start, stop):
+            try:
+                out.append(reader.pages[i].extract_text() or "")
+            except Exception as e:
+                print(f"❌ PDF page {i + 1} of {path}:", e)
+                out.append("")
+        return out
+
+
+def page_count(path):
+    with open(path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+# --------------------------------------------------
+# PUBLIC
+# --------------------------------------------------
+def iter_pdf_pages(path, max_pages=None, timeout=None):
+    """Yield (page_number, text) in order, extracting page ranges in parallel."""
+    if PyPDF2 is None:
+        return
+
+    max_pages = max_pages or PAGE_BUDGET
+    deadline = time.monotonic() + (timeout or DOC_TIMEOUT)
+
+    try:
+        total = page_count(path)
+    except Exception as e:
+        print("❌ PyPDF2 error:", e)
+        return
+
+    pages = min(total, max_pages)
+    if total > pages:
+        print(f"📄 {os.path.basename(path)}: {total} pages, extracting the first {pages}")
+
+    ranges = [(s, min(s + PAGES_PER_TASK, pages)) for s in range(0, pages, PAGES_PER_TASK)]
+
+    # One range: not worth a round trip to the pool
+    if len(ranges) <= 1:
+        yield from _iter_inline(path, ranges, deadline)
+        return
+
+    try:
+        pool = _get_pool()
+        futures = [pool.submit(_extract_range, path, s, e) for s, e in ranges]
+    except Exception as e:
+        print("❌ PDF process pool unavailable, extracting in-process:", e)
+        _reset_pool()
+        yield from _iter_inline(path, ranges, deadline)
+        return
+
+    try:
+        for n, ((start, _), fut) in enumerate(zip(ranges, futures)):
+            try:
+                texts = fut.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeout:
+                print(f"⏱️ {os.path.basename(path)}: extraction timed out at page {start + 1}")
+                return
+            except Exception as e:
+                # A dead worker breaks the whole pool: rebuild it next time
+                print(f"❌ PDF worker failed at page {start + 1} of {path}, continuing in-process:", e)
+                _reset_pool()
+                yield from _iter_inline(path, ranges[n:], deadline)
+                return
+            for i, text in enumerate(texts):
+                yield start + i + 1, text
+    finally:
+        for fut in futures:
+            fut.cancel()
+
+
+def _iter_inline(path, ranges, deadline):
+    for start, stop in ranges:
+        if time.monotonic() >= deadline:
+            print(f"⏱️ {os.path.basename(path)}: extraction timed out at page {start + 1}")
+            return
+        for i, text in enumerate(_extract_range(path, start, stop)):
+            yield start + i + 1, text
+
+
+def extract_pdf_text(path, max_pages=None, timeout=None):
+    """Whole text with pages separated by form feeds (see utils/chunking)."""
+    return PAGE_BREAK.join(text for _, text in iter_pdf_pages(path, max_pages, timeout))
@@ -4,9 +4,10 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 import os
-import json
 from datetime import datetime
 
+from utils.parsed_cache import parsed_cache
+
 def _short(text, n=300):
     if not text: return ""
     s = text.strip()
@@ -131,8 +132,7 @@ def create_pdf(filename, drug, pubmed, trials, patents, unmet, market):
     combined_path = os.path.join("data", drug, "combined_summary.json")
     if os.path.exists(combined_path):
         try:
-            with open(combined_path, encoding="utf-8") as f:
-                combined = json.load(f)
+            combined = parsed_cache.load_json(combined_path, {})
             # EXIM bullets
             exim = combined.get("exim") or combined.get("exim_trade") or {}
             if exim:
@@ -0,0 +1,153 @@
+# utils/pubmed_xml.py
+"""
+Streaming parsers for NCBI E-utilities XML (efetch / esummary).
+
+Both walk the payload with iterparse, build one record per article and
+clear each element as soon as it is consumed, so memory stays flat no
+matter how many articles a response carries. lxml is used when it is
+installed; the standard library parser is the fallback.
+"""
+try:
+    from lxml import etree as ET
+    LXML = True
+except ImportError:
+    import xml.etree.ElementTree as ET
+    LXML = False
+
+import io
+
+NO_ABSTRACT = "No abstract available."
+
+
+def _source(payload):
+    if isinstance(payload, (bytes, bytearray)):
+        return io.BytesIO(payload)
+    if isinstance(payload, str):
+        return io.BytesIO(payload.encode("utf-8"))
+    return payload                                  # file-like (e.g. resp.raw)
+
+
+def _iterparse(payload, tag):
+    if LXML:
+        return ET.iterparse(_source(payload), events=("end",), tag=tag,
+                            huge_tree=True, recover=True)
+    return (
+        (event, elem)
+        for event, elem in ET.iterparse(_source(payload), events=("end",))
+        if elem.tag == tag
+    )
+
+
+def _free(elem):
+    elem.clear()
+    if LXML:
+        # Drop already-processed siblings still referenced by the root
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+
+def _text(elem):
+    if elem is None:
+        return ""
+    return " ".join("".join(elem.itertext()).split())
+
+
+# --------------------------------------------------
+# EFETCH  (PubmedArticleSet/PubmedArticle)
+# --------------------------------------------------
+def _pub_date(article):
+    pub = article.find("Journal/JournalIssue/PubDate")
+    if pub is None:
+        return ""
+
+    medline = pub.findtext("MedlineDate")
+    if medline:
+        return medline.strip()
+
+    parts = [pub.findtext(p) for p in ("Year", "Month", "Day")]
+    return " ".join(p.strip() for p in parts if p)
+
+
+def _authors(article):
+    authors = []
+    for a in article.iterfind("AuthorList/Author"):
+        collective = a.findtext("CollectiveName")
+        if collective:
+            authors.append(collective.strip())
+            continue
+
+        last = a.findtext("LastName") or ""
+        initials = a.findtext("Initials") or ""
+        name = f"{last} {initials}".strip()
+        if name:
+            authors.append(name)
+    return authors
+
+
+def _abstract(article):
+    """All AbstractText sections, labelled when the abstract is structured."""
+    sections = []
+    for node in article.iterfind("Abstract/AbstractText"):
+        body = _text(node)
+        if not body:
+            continue
+        label = node.get("Label")
+        sections.append(f"{label}: {body}" if label else body)
+
+    return "\n".join(sections) if sections else NO_ABSTRACT
+
+
+def iter_efetch_articles(payload):
+    """
+    Yield {pmid, title, date, journal, authors, abstract} for every
+    PubmedArticle in an efetch (retmode=xml) response.
+    """
+    for _, elem in _iterparse(payload, "PubmedArticle"):
+        citation = elem.find("MedlineCitation")
+        article = citation.find("Article") if citation is not None else None
+
+        if article is not None:
+            journal = article.find("Journal")
+            yield {
+                "pmid": (citation.findtext("PMID") or "").strip(),
+                "title": _text(article.find("ArticleTitle")),
+                "date": _pub_date(article),
+                "journal": (
+                    (journal.findtext("ISOAbbreviation") or journal.findtext("Title") or "").strip()
+                    if journal is not None else ""
+                ),
+                "authors": _authors(article),
+                "abstract": _abstract(article)
+            }
+
+        _free(elem)
+
+
+# --------------------------------------------------
+# ESUMMARY  (eSummaryResult/DocSum)
+# --------------------------------------------------
+def iter_esummary_docs(payload):
+    """
+    Yield {pmid, title, date, journal, authors} for every DocSum in an
+    esummary (retmode=xml) response.
+    """
+    for _, elem in _iterparse(payload, "DocSum"):
+        items = {}
+        authors = []
+
+        for item in elem.iter("Item"):
+            name = item.get("Name")
+            if name == "Author":
+                authors.append((item.text or "").strip())
+            elif name in ("Title", "PubDate", "Source") and name not in items:
+                items[name] = (item.text or "").strip()
+
+        yield {
+            "pmid": (elem.findtext("Id") or "").strip(),
+            "title": items.get("Title", ""),
+            "date": items.get("PubDate", ""),
+            "journal": items.get("Source", ""),
+            "authors": authors
+        }
+
+        _free(elem)
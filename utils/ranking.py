@@ -0,0 +1,198 @@
+# utils/ranking.py
+"""
+Cross-drug ranking over stored combined summaries, for portfolio triage.
+
+Every analysed drug becomes one row of a NumPy feature table (evidence,
+trial pipeline, patent expiry, market, trade trend). Columns are
+z-scored across the portfolio (missing values take the column median),
+and a drug's score is the weighted sum of its z-scores — deterministic,
+no LLM call, milliseconds for hundreds of drugs.
+
+The raw table is kept in parsed_cache and rebuilt only when some drug's
+combined summary changes.
+
+Usage: python -m utils.ranking [top_n]
+"""
+import re
+import sys
+import time
+
+import numpy as np
+
+from utils.datastore import store
+from utils.parsed_cache import parsed_cache
+
+# feature -> weight. Negative weights favour low values: fewer live
+# patents and an earlier first expiry leave more room to repurpose.
+WEIGHTS = {
+    "pubmed": 1.0,
+    "trials": 0.5,
+    "trials_late_phase": 1.5,
+    "trials_active": 1.0,
+    "trials_completed": 0.5,
+    "patents_active": -0.5,
+    "years_to_expiry": -1.0,
+    "expiring_5y_share": 0.5,
+    "market_size_usd_b": 1.0,
+    "cagr_pct": 1.0,
+    "export_trend": 0.5,
+}
+FEATURES = list(WEIGHTS)
+
+LATE_PHASES = ("PHASE2", "PHASE3", "PHASE4")
+ACTIVE_STATUSES = ("RECRUITING", "NOT_YET_RECRUITING", "ACTIVE_NOT_RECRUITING",
+                   "ENROLLING_BY_INVITATION")
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+# --------------------------------------------------
+# FEATURE EXTRACTION (ONE DRUG)
+# --------------------------------------------------
+def _number(value):
+    """5.15 from "5.15B", 6.2 from "6.2%"; NaN when there is no number."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = _NUMBER.search(str(value or ""))
+    return float(m.group(0)) if m else np.nan
+
+
+def _export_trend(exim):
+    """Relative change of export volume from the first to the last year."""
+    volumes = (exim.get("export_data") or {}).get("export_volume_kgs")
+    if isinstance(volumes, dict) and volumes:
+        series = [volumes[y] for y in sorted(volumes)]
+    else:
+        series = [row.get("export_volume_mt") for row in exim.get("trade_history") or []]
+
+    series = [_number(v) for v in series]
+    series = [v for v in series if not np.isnan(v)]
+    if len(series) < 2 or series[0] <= 0:
+        return np.nan
+    return (series[-1] - series[0]) / series[0]
+
+
+def features(combined, year=None):
+    """Feature vector (in FEATURES order) for one combined summary."""
+    year = year or time.gmtime().tm_year
+    trials = combined.get("clinical_trials") or []
+    patents = combined.get("patents") or []
+    iqvia = combined.get("iqvia") or {}
+    exim = combined.get("exim") or {}
+
+    late = active = completed = 0
+    for t in trials:
+        phases = t.get("phases") or []
+        status = (t.get("status") or "").upper()
+        late += any(p in LATE_PHASES for p in phases)
+        active += status in ACTIVE_STATUSES
+        completed += status == "COMPLETED"
+
+    expiries = np.array([_number(p.get("expiry_year")) for p in patents], dtype=float)
+    years_left = expiries[~np.isnan(expiries)] - year
+
+    values = {
+        "pubmed": combined.get("pubmed_count", len(combined.get("pubmed") or [])),
+        "trials": len(trials),
+        "trials_late_phase": late,
+        "trials_active": active,
+        "trials_completed": completed,
+        "patents_active": sum(str(p.get("status", "")).lower() == "active" for p in patents),
+        "years_to_expiry": years_left.min() if years_left.size else np.nan,
+        "expiring_5y_share": (years_left <= 5).mean() if years_left.size else np.nan,
+        "market_size_usd_b": _number(iqvia.get("market_size_2024_usd_billion")),
+        "cagr_pct": _number(iqvia.get("CAGR")),
+        "export_trend": _export_trend(exim),
+    }
+    return np.array([values[f] for f in FEATURES], dtype=float)
+
+
+# --------------------------------------------------
+# FEATURE TABLE (ALL DRUGS)
+# --------------------------------------------------
+def feature_table():
+    """(drugs, matrix): one row per analysed drug, columns in FEATURES order."""
+    # Folders added since the store was opened
+    store.import_legacy_folders()
+    stamps = store.stamps("combined")
+
+    def build():
+        drugs, rows = [], []
+        for drug in stamps:
+            combined = store.get(drug, "combined")
+            if combined:
+                drugs.append(drug)
+                rows.append(features(combined))
+        matrix = np.vstack(rows) if rows else np.empty((0, len(FEATURES)))
+        return drugs, matrix
+
+    return parsed_cache.get(("ranking", "features"), tuple(stamps.items()), build)
+
+
+# --------------------------------------------------
+# SCORING
+# --------------------------------------------------
+def zscores(matrix):
+    """Column z-scores; NaN → column median, constant or empty columns → 0."""
+    x = matrix.copy()
+    if not x.size:
+        return x
+
+    empty = np.isnan(x).all(axis=0)
+    medians = np.zeros(x.shape[1])
+    medians[~empty] = np.nanmedian(x[:, ~empty], axis=0)
+    x = np.where(np.isnan(x), medians, x)
+
+    std = x.std(axis=0)
+    std[std == 0] = 1.0
+    return (x - x.mean(axis=0)) / std
+
+
+def rank(top=None, weights=None):
+    """Drugs best first: [{"rank", "drug", "score", "features"}, ...]."""
+    drugs, matrix = feature_table()
+    if not drugs:
+        return []
+
+    weights = {**WEIGHTS, **(weights or {})}
+    w = np.array([weights[f] for f in FEATURES])
+    scores = zscores(matrix) @ w
+
+    # Ties broken by name so the order never depends on insertion order
+    order = np.lexsort((np.array(drugs), -scores))[:top]
+
+    return [
+        {
+            "rank": n,
+            "drug": drugs[i],
+            "score": round(float(scores[i]), 3),
+            "features": {
+                f: None if np.isnan(v) else round(float(v), 3)
+                for f, v in zip(FEATURES, matrix[i])
+            },
+        }
+        for n, i in enumerate(order, 1)
+    ]
+
+
+def main(top=10):
+    t0 = time.perf_counter()
+    ranked = rank(top)
+    ms = (time.perf_counter() - t0) * 1000
+
+    if not ranked:
+        print("No analysed drugs in the datastore.")
+        return
+
+    print(f"\n{'RANK':<5} {'DRUG':<20} {'SCORE':>7}  " + "  ".join(f[:12] for f in FEATURES))
+    for r in ranked:
+        cells = "  ".join(
+            f"{'-' if r['features'][f] is None else r['features'][f]:>{len(f[:12])}}"
+            for f in FEATURES
+        )
+        print(f"{r['rank']:<5} {r['drug']:<20} {r['score']:>7}  {cells}")
+    print(f"\n⏱️ Ranked in {ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
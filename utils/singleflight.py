@@ -0,0 +1,62 @@
+# utils/singleflight.py
+import threading
+from collections import defaultdict
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key.
+
+    The first caller of do(key, fn) runs fn; callers arriving while it is
+    still in flight wait and receive the same result (or exception)
+    instead of starting a second run. Nothing is cached afterwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns (result, shared) — shared is True for callers that attached."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+
+class KeyedLocks:
+    """One lock per key (e.g. per drug), created on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = defaultdict(threading.Lock)
+
+    def __call__(self, key):
+        with self._lock:
+            return self._locks[key]
@@ -0,0 +1,129 @@
+# utils/task_graph.py
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TaskGraph:
+    """
+    Tiny dependency-aware executor for the agent pipeline.
+
+    Every task is a callable that receives the results of its dependencies
+    (in the order they were declared). Tasks without a dependency in common
+    run in parallel on a thread pool. A task that fails, exceeds its own
+    timeout or is cut off by the global deadline resolves to its default
+    value, so downstream tasks and the final report always have something
+    to work with.
+    """
+
+    def __init__(self, max_workers=8, deadline=None):
+        self.max_workers = max_workers
+        self.deadline = deadline          # seconds for the whole graph
+        self.tasks = {}                   # name -> task spec (insertion ordered)
+
+    # --------------------------------------------------
+    # BUILD
+    # --------------------------------------------------
+    def add(self, name, fn, deps=(), timeout=None, default=None):
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"Task '{name}' depends on unknown task '{dep}'")
+
+        self.tasks[name] = {
+            "fn": fn,
+            "deps": tuple(deps),
+            "timeout": timeout,
+            "default": default,
+        }
+        return self
+
+    # --------------------------------------------------
+    # RUN
+    # --------------------------------------------------
+    def run(self, on_event=None):
+        """
+        Execute the graph and return (results, timings).
+
+        timings[name] = {"status": ok|error|timeout|skipped, "seconds": float}
+        on_event(name, timing) is called as soon as each task settles.
+        """
+        results = {}
+        timings = {}
+        pending = dict(self.tasks)
+        running = {}                      # future -> (name, started_at)
+
+        started = time.monotonic()
+        hard_stop = started + self.deadline if self.deadline else None
+
+        def settle(name, value, status, seconds, error=None):
+            results[name] = value
+            timings[name] = {"status": status, "seconds": round(seconds, 3)}
+            if error:
+                timings[name]["error"] = str(error)
+            if on_event:
+                try:
+                    on_event(name, timings[name])
+                except Exception as e:
+                    print("❌ TaskGraph progress callback failed:", e)
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            while pending or running:
+
+                # ---- Launch every task whose inputs are ready ----
+                for name in list(pending):
+                    spec = pending[name]
+                    if all(d in results for d in spec["deps"]):
+                        args = [results[d] for d in spec["deps"]]
+                        fut = pool.submit(spec["fn"], *args)
+                        running[fut] = (name, time.monotonic())
+                        del pending[name]
+
+                if not running:
+                    break
+
+                # ---- Wait for the next completion or the nearest timeout ----
+                now = time.monotonic()
+                limits = []
+                for name, t0 in running.values():
+                    if self.tasks[name]["timeout"]:
+                        limits.append(t0 + self.tasks[name]["timeout"])
+                if hard_stop:
+                    limits.append(hard_stop)
+
+                wait_for = max(0, min(limits) - now) if limits else None
+                done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for fut in done:
+                    name, t0 = running.pop(fut)
+                    elapsed = time.monotonic() - t0
+                    try:
+                        settle(name, fut.result(), "ok", elapsed)
+                    except Exception as e:
+                        print(f"❌ {name} failed:", e)
+                        settle(name, self.tasks[name]["default"], "error", elapsed, e)
+
+                # ---- Expire tasks past their own timeout or the deadline ----
+                now = time.monotonic()
+                for fut, (name, t0) in list(running.items()):
+                    timeout = self.tasks[name]["timeout"]
+                    over_task = timeout and now - t0 >= timeout
+                    over_deadline = hard_stop and now >= hard_stop
+                    if over_task or over_deadline:
+                        fut.cancel()
+                        running.pop(fut)
+                        print(f"⏱️ {name} timed out after {now - t0:.1f}s")
+                        settle(name, self.tasks[name]["default"], "timeout", now - t0)
+
+                # Past the deadline nothing new is started
+                if hard_stop and time.monotonic() >= hard_stop:
+                    for name in list(pending):
+                        settle(name, self.tasks[name]["default"], "skipped", 0)
+                        del pending[name]
+
+        finally:
+            # Timed-out workers cannot be killed; let them finish in the background
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        timings["_total"] = {"status": "ok", "seconds": round(time.monotonic() - started, 3)}
+        return results, timings
@@ -1,7 +1,9 @@
 # utils/text_report.py
-import json, os
+import os
 from datetime import datetime
 
+from utils.parsed_cache import parsed_cache
+
 def safe_list(value):
     if isinstance(value, list):
         return value
@@ -21,7 +23,7 @@ def build_text_report(drug):
     if not os.path.exists(combined_path):
         return f"Error: {combined_path} not found. Run main.py first."
 
-    data = json.load(open(combined_path, encoding="utf-8"))
+    data = parsed_cache.load_json(combined_path)
 
     lines = []
     lines.append(f"==============================\n")
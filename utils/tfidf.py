@@ -0,0 +1,95 @@
+# utils/tfidf.py
+"""
+Corpus-wide TF-IDF over stored PubMed articles (titles + abstracts).
+
+Document frequencies of every unigram and bigram are kept in the
+datastore (`pubmed_terms`) and updated incrementally as articles are
+written, so the IDF table always covers every drug analysed so far and
+is never rebuilt by re-reading JSON.
+
+key_terms() scores the terms of a set of articles (e.g. one drug's
+PubMed results) in one vectorized pass: term counts via np.unique,
+IDF looked up for the whole vocabulary at once, sublinear TF x IDF.
+Terms common to the whole corpus ("patients", "study") score low;
+terms distinctive for this set score high.
+"""
+import numpy as np
+
+from utils.bm25 import tokenize
+
+NGRAMS = (1, 2)
+
+
+def ngrams(tokens, sizes=NGRAMS):
+    out = []
+    for n in sizes:
+        out.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+    return out
+
+
+def article_terms(record):
+    """Unigrams + bigrams of an article; title and abstract are kept apart."""
+    terms = []
+    for field in ("title", "abstract"):
+        tokens = [t for t in tokenize(record.get(field)) if not t.isdigit() and len(t) > 2]
+        terms.extend(ngrams(tokens))
+    return terms
+
+
+class TfidfModel:
+    """
+    IDF from the datastore's corpus statistics; reusable by any agent.
+
+    store: a DataStore (term_df / term_corpus_size).
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def idf(self, terms):
+        """Smoothed IDF for each term (np.array, same order)."""
+        n = self.store.term_corpus_size()
+        df = self.store.term_df(terms)
+        counts = np.array([df.get(t, 0) for t in terms], dtype=float)
+        return np.log((1 + n) / (1 + counts)) + 1
+
+    def key_terms(self, records, k=8, exclude=(), min_tf=2):
+        """
+        Top-k (term, score) of the records taken together, best first.
+
+        exclude: words (e.g. the drug name) whose terms are skipped.
+        Picked terms never share a word with a picked bigram: the phrase
+        replaces its single words, and overlapping phrases are skipped.
+        """
+        terms = [t for r in records for t in article_terms(r)]
+        if not terms:
+            return []
+
+        vocab, tf = np.unique(np.array(terms), return_counts=True)
+        keep = tf >= min_tf
+        skip = set(tokenize(" ".join(exclude)))
+        if skip:
+            keep &= np.array([not (set(v.split()) & skip) for v in vocab])
+        vocab, tf = vocab[keep], tf[keep]
+        if not vocab.size:
+            return []
+
+        scores = (1 + np.log(tf)) * self.idf(vocab.tolist())
+
+        # Best first, ties by term so the output is deterministic
+        order = np.lexsort((vocab, -scores))
+
+        picked, in_bigrams = [], set()
+        for i in order:
+            term = str(vocab[i])
+            words = term.split()
+            if in_bigrams & set(words):
+                continue
+            if len(words) > 1:
+                # The phrase replaces its words picked on their own
+                picked = [p for p in picked if p[0] not in words]
+                in_bigrams.update(words)
+            picked.append((term, round(float(scores[i]), 3)))
+            if len(picked) == k:
+                break
+        return picked